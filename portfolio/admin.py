@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils import timezone
 from .models import (
 	Skill,
 	Education,
@@ -6,8 +7,11 @@ from .models import (
 	Project,
 	BlogPost,
 	ContactMessage,
+	OutboxEmail,
 	PersonalInfo,
 )
+from .outbox import notify_outbox
+from .spam import train_classifier
 
 
 @admin.register(PersonalInfo)
@@ -21,10 +25,44 @@ class PersonalInfoAdmin(admin.ModelAdmin):
 
 @admin.register(ContactMessage)
 class ContactMessageAdmin(admin.ModelAdmin):
-	list_display = ('name', 'email', 'subject', 'created_at', 'is_read')
-	list_filter = ('is_read', 'created_at')
+	list_display = ('name', 'email', 'subject', 'created_at', 'is_read', 'is_spam')
+	list_filter = ('is_read', 'is_spam', 'created_at')
 	search_fields = ('name', 'email', 'subject', 'message')
 	readonly_fields = ('created_at',)
+	actions = ('mark_as_spam', 'mark_as_not_spam')
+
+	@admin.action(description='Mark as spam and retrain the spam filter')
+	def mark_as_spam(self, request, queryset):
+		self._relabel(request, queryset, True)
+
+	@admin.action(description='Mark as not spam and retrain the spam filter')
+	def mark_as_not_spam(self, request, queryset):
+		self._relabel(request, queryset, False)
+
+	def _relabel(self, request, queryset, is_spam):
+		updated = queryset.update(is_spam=is_spam)
+		model = train_classifier()
+		self.message_user(
+			request,
+			f'{updated} message(s) updated; spam filter retrained on '
+			f'{model.spam_messages} spam and {model.ham_messages} other messages.'
+		)
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+	list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+	list_filter = ('status', 'created_at')
+	search_fields = ('subject', 'last_error')
+	readonly_fields = ('contact_message', 'created_at', 'sent_at', 'last_error')
+	actions = ('retry_now',)
+
+	@admin.action(description='Retry selected emails now')
+	def retry_now(self, request, queryset):
+		queryset.exclude(status=OutboxEmail.SENT).update(
+			status=OutboxEmail.PENDING, next_attempt_at=timezone.now()
+		)
+		notify_outbox()
 
 
 @admin.register(Skill)
@@ -33,6 +71,7 @@ class SkillAdmin(admin.ModelAdmin):
 	list_filter = ('category', 'is_active')
 	search_fields = ('name',)
 	ordering = ('order', 'name')
+	prepopulated_fields = {"slug": ("name",)}
 
 
 @admin.register(Education)
@@ -1,6 +1,34 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+def is_server_process():
+    """Whether this process serves web requests, rather than running a command or tests.
+
+    The WSGI and ASGI entry points set ``PORTFOLIO_SERVER``; ``runserver``
+    counts in the process that serves (the autoreloader's child).
+    """
+    if os.environ.get('PORTFOLIO_SERVER') == 'True':
+        return True
+    return sys.argv[1:2] == ['runserver'] and (
+        os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+    )
+
+
 class PortfolioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'portfolio'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import signals  # noqa: F401
+        from .metrics import registry
+        from .outbox import worker
+
+        if is_server_process():
+            registry.enable()
+            if settings.EMAIL_OUTBOX_THREAD:
+                worker.start()
@@ -0,0 +1,193 @@
+"""Build the site stylesheet, the fonts and the icon subset served from our own static files.
+
+``build()`` runs before ``collectstatic`` (see the ``build_assets`` command):
+
+1. copies the Latin ``.woff2`` files of ``FONTS`` from ``@fontsource`` and
+   writes their ``@font-face`` rules
+2. writes CSS for just the Font Awesome icons named in templates, Python
+   sources and ``Skill.icon``; each is an SVG mask drawn in ``currentColor``,
+   so no icon font is downloaded
+3. runs the Tailwind CLI on ``assets/site.css``, which imports the above, AOS
+   and ``static/css/custom.css``; Tailwind keeps only the classes found by the
+   ``content`` globs of ``tailwind.config.js`` and minifies the result into
+   ``static/dist/site.css``
+4. extracts each page template's critical CSS from it (see ``portfolio.critical``)
+
+``collectstatic`` then gives the output content-hashed names and WhiteNoise
+serves them compressed, with far-future caching.
+
+The Node packages come from ``package.json`` (``npm install``).
+"""
+import json
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import DatabaseError
+
+
+NODE_MODULES = Path(settings.BASE_DIR) / 'node_modules'
+SOURCE_DIR = Path(settings.BASE_DIR) / 'assets'
+BUILD_DIR = SOURCE_DIR / 'build'
+OUTPUT_DIR = Path(settings.BASE_DIR) / 'static' / 'dist'
+STYLESHEET = 'dist/site.css'
+
+# Font family -> (@fontsource package, weights)
+FONTS = {
+    'Inter': ('inter', (300, 400, 500, 600, 700, 800)),
+    'JetBrains Mono': ('jetbrains-mono', (400, 500, 600)),
+}
+# The font worth preloading: body text.
+PRELOAD_FONT = 'dist/fonts/inter-latin-400-normal.woff2'
+LATIN_RANGE = (
+    'U+0000-00FF,U+0131,U+0152-0153,U+02BB-02BC,U+02C6,U+02DA,U+02DC,U+0304,U+0308,U+0329,'
+    'U+2000-206F,U+2074,U+20AC,U+2122,U+2191,U+2193,U+2212,U+2215,U+FEFF,U+FFFD'
+)
+
+# Sources searched for icon class names.
+ICON_SOURCES = ('templates/**/*.html', 'portfolio/**/*.py')
+# Font Awesome style -> the classes that select it
+ICON_STYLES = {
+    'solid': ('fas', 'fa-solid'),
+    'regular': ('far', 'fa-regular'),
+    'brands': ('fab', 'fa-brands'),
+}
+# Modifier classes styled by ICON_BASE_CSS rather than drawn.
+ICON_MODIFIERS = {'fw', 'spin'}
+ICON_BASE_CSS = (
+    '.fa,%s{display:inline-block;width:1em;height:1em;vertical-align:-.125em;'
+    'background-color:currentColor;-webkit-mask:var(--fa-icon) center/contain no-repeat;'
+    'mask:var(--fa-icon) center/contain no-repeat}'
+    '.fa-fw{width:1.25em!important}'
+    '.fa-spin{animation:fa-spin 2s linear infinite}'
+    '@keyframes fa-spin{to{transform:rotate(360deg)}}'
+)
+
+_ICON_RE = re.compile(r'(?<![\w-])fa-([a-z0-9]+(?:-[a-z0-9]+)*)')
+
+
+def stylesheet_built():
+    """Whether the compiled stylesheet exists: in static/dist with DEBUG, among the collected files otherwise."""
+    if settings.DEBUG:
+        return finders.find(STYLESHEET) is not None
+    try:
+        # Manifest storages raise ValueError for a file that was not collected.
+        name = getattr(staticfiles_storage, 'stored_name', str)(STYLESHEET)
+    except ValueError:
+        return False
+    return staticfiles_storage.exists(name)
+
+
+def font_faces(output_dir):
+    """Copy the font files into ``output_dir/fonts`` and return their ``@font-face`` rules."""
+    fonts_dir = output_dir / 'fonts'
+    fonts_dir.mkdir(parents=True, exist_ok=True)
+    rules = []
+    for family, (package, weights) in FONTS.items():
+        for weight in weights:
+            filename = f'{package}-latin-{weight}-normal.woff2'
+            shutil.copyfile(NODE_MODULES / '@fontsource' / package / 'files' / filename, fonts_dir / filename)
+            rules.append(
+                f"@font-face{{font-family:'{family}';font-style:normal;font-weight:{weight};"
+                f"font-display:swap;src:url('fonts/{filename}') format('woff2');"
+                f"unicode-range:{LATIN_RANGE}}}"
+            )
+    return '\n'.join(rules)
+
+
+def used_icon_names(root=None):
+    """Every ``fa-*`` name in the icon sources and in ``Skill.icon``."""
+    root = Path(root or settings.BASE_DIR)
+    names = set()
+    for pattern in ICON_SOURCES:
+        for path in root.glob(pattern):
+            names.update(_ICON_RE.findall(path.read_text(encoding='utf-8')))
+    from .models import Skill
+    try:
+        for icon in Skill.objects.exclude(icon='').values_list('icon', flat=True):
+            names.update(_ICON_RE.findall(icon))
+    except DatabaseError:
+        # Before the first migrate there are no skills to look at.
+        pass
+    return names
+
+
+def _svg(icon):
+    width, height = icon['width'], icon['height']
+    path = icon['path'] if isinstance(icon['path'], str) else ''.join(icon['path'])
+    return f"<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 {width} {height}'><path d='{path}'/></svg>"
+
+
+def icon_css(names, metadata):
+    """CSS drawing each named icon from Font Awesome's ``icons.json`` metadata.
+
+    Returns the CSS and the names that are neither icons nor ``ICON_MODIFIERS``.
+    """
+    aliases = {}
+    for name, icon in metadata.items():
+        for alias in icon.get('aliases', {}).get('names', ()):
+            aliases[alias] = name
+
+    selectors = ','.join(f'.{cls}' for classes in ICON_STYLES.values() for cls in classes)
+    rules = [ICON_BASE_CSS % selectors]
+    unknown = []
+    style_names = {cls[3:] for classes in ICON_STYLES.values() for cls in classes if cls.startswith('fa-')}
+    for name in sorted(names - ICON_MODIFIERS - style_names):
+        icon = metadata.get(aliases.get(name, name))
+        if icon is None:
+            unknown.append(name)
+            continue
+        for style, svg in sorted(icon.get('svg', {}).items()):
+            if style not in ICON_STYLES:
+                continue
+            image = quote(_svg(svg), safe=" '=:/")
+            width = round(svg['width'] / svg['height'], 4)
+            selector = ','.join(f'.{cls}.fa-{name}' for cls in ICON_STYLES[style])
+            rules.append(f'{selector}{{--fa-icon:url("data:image/svg+xml,{image}");width:{width}em}}')
+    return '\n'.join(rules), unknown
+
+
+def tailwind(output):
+    """Compile ``assets/site.css`` into ``output`` with the Tailwind CLI, purged and minified."""
+    subprocess.run(
+        [
+            str(NODE_MODULES / '.bin' / 'tailwindcss'),
+            '--config', str(Path(settings.BASE_DIR) / 'tailwind.config.js'),
+            '--input', str(SOURCE_DIR / 'site.css'),
+            '--output', str(output),
+            '--minify',
+        ],
+        cwd=settings.BASE_DIR,
+        check=True,
+    )
+
+
+def build():
+    """Build everything into ``static/dist``.
+
+    Returns the icon names that were not found and the page templates whose
+    critical CSS was rebuilt and reused.
+    """
+    if not NODE_MODULES.is_dir():
+        raise FileNotFoundError(f'{NODE_MODULES} is missing; run "npm install" first')
+    BUILD_DIR.mkdir(parents=True, exist_ok=True)
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    (BUILD_DIR / 'fonts.css').write_text(font_faces(OUTPUT_DIR), encoding='utf-8')
+
+    metadata_path = NODE_MODULES / '@fortawesome' / 'fontawesome-free' / 'metadata' / 'icons.json'
+    metadata = json.loads(metadata_path.read_text(encoding='utf-8'))
+    css, unknown = icon_css(used_icon_names(), metadata)
+    (BUILD_DIR / 'icons.css').write_text(css, encoding='utf-8')
+
+    shutil.copyfile(NODE_MODULES / 'aos' / 'dist' / 'aos.js', OUTPUT_DIR / 'aos.js')
+    tailwind(OUTPUT_DIR / 'site.css')
+
+    from .critical import build_critical
+    rebuilt, reused = build_critical(OUTPUT_DIR / 'site.css')
+    return unknown, rebuilt, reused
@@ -0,0 +1,372 @@
+import hashlib
+import os
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from urllib.parse import urlencode
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from django.conf import settings
+from django.core.cache import cache as default_cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .instrumentation import TimedCache, record
+from .metrics import registry
+from .minify import is_html, minify_response
+from .models import PersonalInfo
+
+cache = TimedCache(default_cache)
+
+
+PERSONAL_INFO_CACHE_KEY = 'portfolio:personal_info'
+PERSONAL_INFO_LOCAL_TTL = 5
+PERSONAL_INFO_SHARED_TTL = 60 * 60
+
+# Stored in the shared cache when there is no PersonalInfo row, so an empty
+# table is cached too instead of hitting the database on every request.
+_MISSING = 'missing'
+
+_local = {'value': None, 'expires': 0.0}
+
+
+def get_personal_info():
+    """Return the PersonalInfo singleton from the local tier, the shared cache or the database."""
+    now = time.monotonic()
+    if _local['expires'] > now:
+        return _local['value']
+
+    value = cache.get(PERSONAL_INFO_CACHE_KEY)
+    if value is None:
+        value = PersonalInfo.objects.first() or _MISSING
+        cache.set(PERSONAL_INFO_CACHE_KEY, value, PERSONAL_INFO_SHARED_TTL)
+    if value == _MISSING:
+        value = None
+
+    _local['value'] = value
+    _local['expires'] = now + PERSONAL_INFO_LOCAL_TTL
+    return value
+
+
+def invalidate_personal_info():
+    """Drop the cached PersonalInfo from both tiers."""
+    _local['value'] = None
+    _local['expires'] = 0.0
+    cache.delete(PERSONAL_INFO_CACHE_KEY)
+
+
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+PAGE_SOFT_TTL = 5 * 60
+CONTENT_VERSION_KEY = 'portfolio:version:%s'
+
+
+def _version_key(model):
+    return CONTENT_VERSION_KEY % model._meta.label_lower
+
+
+def content_versions(models):
+    """Return the current content version of each model, keyed by model label."""
+    keys = {_version_key(model): model._meta.label_lower for model in models}
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A missing version (first use or eviction) starts a new
+            # generation, so entries cached under an older one are never served.
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return {keys[key]: versions[key] for key in keys}
+
+
+def bump_content_version(model):
+    """Start a new content generation for ``model``, invalidating dependent pages."""
+    cache.set(_version_key(model), time.time_ns(), None)
+
+
+def is_page_cacheable(request):
+    """Anonymous GET/HEAD requests without a session or pending messages."""
+    return (
+        request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and 'messages' not in request.COOKIES
+    )
+
+
+def content_validators(versions):
+    """Return an ``(etag, last_modified)`` pair for a set of content versions.
+
+    The release id is mixed in so a deploy with new templates changes the ETag.
+    """
+    parts = [settings.RELEASE] + [
+        '%s=%s' % (label, versions[label]) for label in sorted(versions)
+    ]
+    digest = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    last_modified = max(versions.values()) // 10 ** 9 if versions else None
+    return quote_etag(digest), last_modified
+
+
+SINGLE_FLIGHT_LOCK_TIMEOUT = 10
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+# Lock files shared by the keys of a file-based cache; keys that share one
+# only make each other wait.
+LOCK_STRIPES = 1024
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+
+
+class SharedLock:
+    """A non-blocking lock shared by every process using the default cache.
+
+    FileBasedCache.add() checks for the key and then writes it, so two
+    processes can both take a lock through it. With that backend the lock is
+    an ``flock()`` on a file in the cache directory instead, which the kernel
+    also releases if the holder dies. Other backends use ``add()``, which is
+    atomic in Redis and Memcached.
+    """
+
+    def __init__(self, key, timeout=SINGLE_FLIGHT_LOCK_TIMEOUT):
+        self.key = key
+        self.timeout = timeout
+        self._fd = None
+
+    def _path(self):
+        backend = caches['default']
+        if fcntl is None or not isinstance(backend, FileBasedCache):
+            return None
+        digest = hashlib.md5(self.key.encode(), usedforsecurity=False).hexdigest()
+        return os.path.join(backend._dir, 'lock-%d' % (int(digest, 16) % LOCK_STRIPES))
+
+    def _try_flock(self, path, operation):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, operation | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def acquire(self):
+        path = self._path()
+        if path is None:
+            return cache.add(self.key, 1, self.timeout)
+        self._fd = self._try_flock(path, fcntl.LOCK_EX)
+        return self._fd is not None
+
+    def release(self):
+        if self._fd is None:
+            cache.delete(self.key)
+        else:
+            # Closing the file releases the lock.
+            os.close(self._fd)
+            self._fd = None
+
+    def held(self):
+        """Whether anyone, in this process or another, holds the lock."""
+        path = self._path()
+        if path is None:
+            return bool(cache.get(self.key))
+        fd = self._try_flock(path, fcntl.LOCK_SH)
+        if fd is None:
+            return True
+        os.close(fd)
+        return False
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+    registry.inc('portfolio_cache_lookups_total', {'result': outcome})
+
+
+def single_flight_stats():
+    """Per-process counts of hit, miss, stale and coalesced lookups."""
+    with _stats_lock:
+        return {outcome: _stats[outcome] for outcome in ('hit', 'miss', 'stale', 'coalesced')}
+
+
+def _wait_for(key, version, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        envelope = cache.get(key)
+        if envelope is not None and envelope['version'] == version:
+            return envelope
+        if not SharedLock(key + ':lock').held():
+            break
+    return None
+
+
+def single_flight(key, version, compute, soft_ttl=PAGE_SOFT_TTL, timeout=PAGE_CACHE_TIMEOUT):
+    """Return the cached value for ``key``, computing it at most once at a time.
+
+    An entry is fresh while its ``version`` matches and its soft TTL has not
+    passed. Otherwise one caller recomputes it, guarded by an in-process flight
+    and a SharedLock between processes, while every other caller gets
+    the stale value, or waits for the new one if there is none. ``compute``
+    may return None to signal that its result must not be cached.
+    """
+    envelope = cache.get(key)
+    if envelope is not None and envelope['version'] == version and envelope['fresh_until'] > time.time():
+        _count('hit')
+        return envelope['value']
+
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+
+    if not leader:
+        if envelope is not None:
+            _count('stale')
+            return envelope['value']
+        flight.event.wait(SINGLE_FLIGHT_LOCK_TIMEOUT)
+        if flight.value is not None:
+            _count('coalesced')
+            return flight.value
+        _count('miss')
+        return compute()
+
+    try:
+        lock = SharedLock(key + ':lock')
+        if lock.acquire():
+            try:
+                flight.value = compute()
+                if flight.value is not None:
+                    cache.set(key, {
+                        'value': flight.value,
+                        'version': version,
+                        'fresh_until': time.time() + soft_ttl,
+                    }, timeout)
+            finally:
+                lock.release()
+            _count('miss')
+        elif envelope is not None:
+            _count('stale')
+            flight.value = envelope['value']
+        else:
+            envelope = _wait_for(key, version, SINGLE_FLIGHT_LOCK_TIMEOUT)
+            if envelope is not None:
+                _count('coalesced')
+                flight.value = envelope['value']
+            else:
+                _count('miss')
+                flight.value = compute()
+        return flight.value
+    finally:
+        flight.event.set()
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def page_cache_key(request):
+    """Build the page cache key from the path and query string.
+
+    The light/dark theme is applied client-side, so it is not part of the key.
+    Content versions are checked by single_flight() through the page's ETag.
+    """
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.md5(
+        '|'.join([settings.RELEASE, request.path, query]).encode(), usedforsecurity=False
+    ).hexdigest()
+    return 'portfolio:page:%s' % digest
+
+
+def _set_validators(response, etag, last_modified):
+    response.setdefault('ETag', etag)
+    if last_modified is not None:
+        response.setdefault('Last-Modified', http_date(last_modified))
+    patch_cache_control(response, no_cache=True)
+
+
+def serve_cached(request, models, view):
+    """Run ``view`` behind conditional GET handling and the page cache.
+
+    Requests that are not anonymous GET/HEAD requests go straight to ``view``.
+    Otherwise ``If-None-Match``/``If-Modified-Since`` are answered with a 304
+    from the content versions of ``models`` before anything is rendered, and
+    the page itself is served through single_flight().
+    """
+    if not is_page_cacheable(request):
+        return view()
+
+    etag, last_modified = content_validators(content_versions(models))
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        _set_validators(response, etag, last_modified)
+        return response
+
+    rendered = {}
+
+    def render_page():
+        response = rendered['response'] = view()
+        if hasattr(response, 'render') and not response.is_rendered:
+            with record('template'):
+                response.render()
+        if response.status_code != 200 or response.streaming:
+            return None
+        if settings.HTML_MINIFY and is_html(response):
+            # Cached minified, so each page version is minified only once.
+            minify_response(response)
+        return {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'etag': etag,
+            'last_modified': last_modified,
+            'html_bytes_saved': getattr(response, 'html_bytes_saved', None),
+        }
+
+    key = page_cache_key(request)
+    page = single_flight(key, etag, render_page)
+    if page is None or 'response' in rendered:
+        response = rendered['response']
+    else:
+        response = HttpResponse(page['content'], content_type=page['content_type'])
+        response.html_bytes_saved = page.get('html_bytes_saved')
+    if response.status_code == 200 and page is not None:
+        _set_validators(response, page['etag'], page['last_modified'])
+        # Lets CompressionMiddleware cache this page version's compressed bytes.
+        response.compressed_cache_key = '%s:%s' % (key, page['etag'].strip('"'))
+    return response
+
+
+def cached_page(*models):
+    """Decorator serving a function view through serve_cached() for ``models``."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            return serve_cached(request, models, lambda: view_func(request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+class CachedPageMixin:
+    """Serve anonymous traffic for a view from the page cache.
+
+    ``cache_dependencies`` lists the models the page is rendered from; saving
+    or deleting any of them invalidates the cached copy and its ETag.
+    """
+    cache_dependencies = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        parent = super()
+        return serve_cached(
+            request, self.cache_dependencies,
+            lambda: parent.dispatch(request, *args, **kwargs),
+        )
@@ -0,0 +1,101 @@
+"""Brotli and gzip compression of dynamic responses, negotiated by ``Accept-Encoding``.
+
+Pages served from the page cache carry the key of their cached copy; their
+compressed bytes are cached next to it under the same ETag, so each page
+version is compressed once per encoding and at a higher level than live
+responses can afford. Everything else is compressed per response.
+
+Brotli needs the optional ``Brotli`` package; without it only gzip is offered.
+"""
+import gzip
+
+from django.conf import settings
+from django.utils.text import compress_string
+
+from .cache import PAGE_CACHE_TIMEOUT, cache
+from .metrics import registry
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+)
+# Levels per encoding for responses compressed on the fly and for cached pages.
+LIVE_LEVELS = {'br': 4, 'gzip': 6}
+CACHED_LEVELS = {'br': 9, 'gzip': 9}
+COMPRESSED_KEY = '%s:%s'
+
+
+def available_encodings():
+    """Supported encodings, preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding):
+    """The best available encoding the client accepts, or None for identity."""
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+
+    best, best_weight = None, 0.0
+    for coding in available_encodings():
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return (
+        not response.streaming
+        and not response.has_header('Content-Encoding')
+        and 'no-transform' not in response.get('Cache-Control', '')
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+        and len(response.content) >= settings.COMPRESSION_MIN_SIZE
+    )
+
+
+def compress(content, encoding, cached=False):
+    levels = CACHED_LEVELS if cached else LIVE_LEVELS
+    if encoding == 'br':
+        return brotli.compress(content, quality=levels['br'])
+    if cached:
+        # Cached pages are public and identical for everyone, so a stable
+        # result is fine; live responses get Django's BREACH padding.
+        return gzip.compress(content, compresslevel=levels['gzip'], mtime=0)
+    return compress_string(content, max_random_bytes=100)
+
+
+def compressed_content(response, encoding):
+    """The response body in ``encoding``, from the cache when the page cache key is known."""
+    key = getattr(response, 'compressed_cache_key', None)
+    if key is None:
+        registry.inc('portfolio_compressed_responses_total', {'encoding': encoding, 'source': 'live'})
+        return compress(response.content, encoding)
+
+    key = COMPRESSED_KEY % (key, encoding)
+    content = cache.get(key)
+    if content is None:
+        content = compress(response.content, encoding, cached=True)
+        cache.set(key, content, PAGE_CACHE_TIMEOUT)
+        source = 'compressed'
+    else:
+        source = 'cached'
+    registry.inc('portfolio_compressed_responses_total', {'encoding': encoding, 'source': source})
+    return content
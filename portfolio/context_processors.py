@@ -1,10 +1,18 @@
-from .models import PersonalInfo
+from django.utils.functional import SimpleLazyObject
+
+from .assets import stylesheet_built
+from .cache import get_personal_info
 
 
 def personal_info(request):
-	"""Expose PersonalInfo globally to all templates."""
+	"""Expose PersonalInfo globally to all templates, resolved on first use."""
 	return {
-		'personal_info': PersonalInfo.objects.first()
+		'personal_info': SimpleLazyObject(get_personal_info)
 	}
 
 
+def assets(request):
+	"""Whether to link the compiled stylesheet rather than the CDN development fallback."""
+	return {
+		'assets_built': stylesheet_built()
+	}
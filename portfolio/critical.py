@@ -0,0 +1,285 @@
+"""Above-the-fold ("critical") CSS per page template, inlined so first paint does not wait on the stylesheet.
+
+``build_critical()`` renders each of ``CRITICAL_PAGES`` against the
+``critical_css`` fixture, loaded into a scratch in-memory SQLite database so
+the configured one is never written to or locked. It
+collects the classes and ids used in the first ``FOLD_BYTES`` of markup in
+the body, and keeps the stylesheet rules that can match them. There is no
+layout engine here, so that markup prefix stands in for the fold.
+
+Rules with only element or universal selectors are always kept, as are
+``@font-face`` rules and the ``@keyframes`` that kept rules use.
+
+Results go to ``static/dist/critical.json``, keyed by a hash of the
+stylesheet, the fixture and the template with everything it extends or
+includes. A rebuild only renders the pages whose key changed.
+"""
+import hashlib
+import json
+import os
+import posixpath
+import re
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.template.loader import get_template
+from django.templatetags.static import static
+from django.urls import reverse
+
+from .assets import OUTPUT_DIR
+
+
+CRITICAL_FILE = 'dist/critical.json'
+FIXTURE = Path(__file__).resolve().parent / 'fixtures' / 'critical_css.json'
+# Template -> (URL name, URL kwargs) of a page rendering it with the fixture.
+CRITICAL_PAGES = {
+    'portfolio/home.html': ('home', {}),
+    'portfolio/about.html': ('about', {}),
+    'portfolio/projects.html': ('projects', {}),
+    'portfolio/project_detail.html': ('project_detail', {'pk': 1}),
+    'portfolio/contact.html': ('contact', {}),
+}
+# Body markup, scripts excluded, treated as above the fold.
+FOLD_BYTES = 16 * 1024
+# Classes added by scripts before first paint (base.html turns on dark mode).
+SCRIPT_CLASSES = {'dark'}
+
+_TEMPLATE_REF_RE = re.compile(r'{%\s*(?:extends|include)\s+[\'"]([^\'"]+)[\'"]')
+_SCRIPT_RE = re.compile(r'<(script|style)\b.*?</\1\s*>', re.S | re.I)
+_ATTRIBUTE_RE = re.compile(r'(?<!\\)\[.*?(?<!\\)\]')
+_CLASS_RE = re.compile(r'\.((?:\\[0-9a-fA-F]{1,6} ?|\\.|[\w-])+)')
+_ID_RE = re.compile(r'#((?:\\.|[\w-])+)')
+_ESCAPE_RE = re.compile(r'\\(?:([0-9a-fA-F]{1,6}) ?|(.))')
+_ANIMATION_RE = re.compile(r'animation(?:-name)?\s*:\s*([^;}]+)')
+_RELATIVE_URL_RE = re.compile(r'url\(\s*([\'"]?)(?![a-z]+:|/|#)([^\'")]+)\1\s*\)')
+
+
+def _unescape(identifier):
+    return _ESCAPE_RE.sub(lambda m: chr(int(m.group(1), 16)) if m.group(1) else m.group(2), identifier)
+
+
+def split_blocks(css):
+    """Top-level ``(prelude, body)`` pairs of a stylesheet; ``body`` is None for statements like ``@import``."""
+    blocks = []
+    depth, start, body_start, quote = 0, 0, None, None
+    i = 0
+    while i < len(css):
+        char = css[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            i = len(css) if end == -1 else end + 1
+            if depth == 0:
+                start = i + 1
+        elif char == '{':
+            if depth == 0:
+                body_start = i
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((css[start:body_start].strip(), css[body_start + 1:i]))
+                start = i + 1
+        elif char == ';' and depth == 0:
+            blocks.append((css[start:i].strip(), None))
+            start = i + 1
+        i += 1
+    return blocks
+
+
+def selector_matches(selector, classes, ids):
+    """Whether every class and id in the selector is in use; element and attribute parts are ignored."""
+    selector = _ATTRIBUTE_RE.sub('', selector)
+    return (
+        all(_unescape(name) in classes for name in _CLASS_RE.findall(selector))
+        and all(_unescape(name) in ids for name in _ID_RE.findall(selector))
+    )
+
+
+def _filter(blocks, classes, ids):
+    kept = []
+    for prelude, body in blocks:
+        if body is None:
+            kept.append(f'{prelude};')
+        elif prelude.startswith('@font-face'):
+            kept.append(f'{prelude}{{{body}}}')
+        elif prelude.startswith(('@media', '@supports', '@layer')):
+            inner = _filter(split_blocks(body), classes, ids)
+            if inner:
+                kept.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            # @keyframes and the like are added back when something uses them.
+            continue
+        else:
+            selectors = [s for s in prelude.split(',') if selector_matches(s, classes, ids)]
+            if selectors:
+                kept.append(f"{','.join(s.strip() for s in selectors)}{{{body}}}")
+    return ''.join(kept)
+
+
+def extract_critical(css, classes, ids):
+    """The rules of ``css`` that can apply to elements with the given classes and ids."""
+    blocks = split_blocks(css)
+    critical = _filter(blocks, classes | SCRIPT_CLASSES, ids)
+    animations = set()
+    for value in _ANIMATION_RE.findall(critical):
+        animations.update(value.replace(',', ' ').split())
+    keyframes = ''.join(
+        f'{prelude}{{{body}}}' for prelude, body in blocks
+        if body is not None and re.match(r'@(?:-webkit-)?keyframes\s', prelude)
+        and prelude.split()[-1] in animations
+    )
+    return critical + keyframes
+
+
+class _AttributeCollector(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.classes, self.ids = set(), set()
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if name == 'class' and value:
+                self.classes.update(value.split())
+            elif name == 'id' and value:
+                self.ids.add(value)
+
+
+def above_fold_selectors(html):
+    """Classes and ids of the first ``FOLD_BYTES`` of body markup."""
+    body = html[html.find('<body'):] if '<body' in html else html
+    body = _SCRIPT_RE.sub('', body)[:FOLD_BYTES]
+    collector = _AttributeCollector()
+    collector.feed(body)
+    return collector.classes, collector.ids
+
+
+def template_sources(template_name, seen=None):
+    """Source of the template and of every template it extends or includes, by name."""
+    seen = {} if seen is None else seen
+    if template_name not in seen:
+        source = get_template(template_name).template.source
+        seen[template_name] = source
+        for reference in _TEMPLATE_REF_RE.findall(source):
+            template_sources(reference, seen)
+    return seen
+
+
+def cache_key(template_name, stylesheet, fixture):
+    digest = hashlib.sha256(stylesheet)
+    digest.update(fixture)
+    for name, source in sorted(template_sources(template_name).items()):
+        digest.update(name.encode())
+        digest.update(source.encode())
+    return digest.hexdigest()
+
+
+@contextmanager
+def scratch_database():
+    """Point this thread's default connection at a new, migrated in-memory SQLite database.
+
+    Other threads, and the configured database, are untouched.
+    """
+    original = connections[DEFAULT_DB_ALIAS]
+    scratch = ConnectionHandler({
+        DEFAULT_DB_ALIAS: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+    })[DEFAULT_DB_ALIAS]
+    connections[DEFAULT_DB_ALIAS] = scratch
+    try:
+        call_command('migrate', verbosity=0, interactive=False)
+        yield
+    finally:
+        scratch.close()
+        connections[DEFAULT_DB_ALIAS] = original
+
+
+def render_pages(template_names):
+    """Render the pages of the given templates against the fixture; returns {template: html}.
+
+    The fixture is loaded into a scratch database, in a transaction that is
+    rolled back so the work its save signals queue for after commit never
+    runs. A throwaway local cache keeps fixture pages out of the shared page
+    cache, and plain static storage is used since the manifest is not built yet.
+    """
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    from .related import rebuild_related
+
+    pages = {}
+    with override_settings(
+        ALLOWED_HOSTS=['testserver'],
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'critical-css'}},
+        STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}},
+    ), scratch_database():
+        with transaction.atomic():
+            call_command('loaddata', str(FIXTURE), verbosity=0)
+            rebuild_related()
+            client = Client()
+            for template_name in template_names:
+                url_name, kwargs = CRITICAL_PAGES[template_name]
+                response = client.get(reverse(url_name, kwargs=kwargs))
+                if response.status_code != 200:
+                    raise RuntimeError(f'{url_name} answered {response.status_code} while extracting critical CSS')
+                pages[template_name] = response.content.decode()
+            transaction.set_rollback(True)
+    return pages
+
+
+def build_critical(stylesheet_path=None):
+    """Refresh ``critical.json`` for templates whose key changed; returns (rebuilt, reused) template names."""
+    stylesheet_path = Path(stylesheet_path or OUTPUT_DIR / 'site.css')
+    output = OUTPUT_DIR / 'critical.json'
+    stylesheet = stylesheet_path.read_bytes()
+    fixture = FIXTURE.read_bytes()
+    try:
+        stored = json.loads(output.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        stored = {}
+
+    keys = {name: cache_key(name, stylesheet, fixture) for name in CRITICAL_PAGES}
+    stale = [name for name, key in keys.items() if stored.get(name, {}).get('key') != key]
+    css = stylesheet.decode()
+    for template_name, html in render_pages(stale).items() if stale else ():
+        classes, ids = above_fold_selectors(html)
+        stored[template_name] = {'key': keys[template_name], 'css': extract_critical(css, classes, ids)}
+
+    result = {name: stored[name] for name in CRITICAL_PAGES}
+    output.write_text(json.dumps(result, indent=1, sort_keys=True), encoding='utf-8')
+    return stale, [name for name in CRITICAL_PAGES if name not in stale]
+
+
+def absolute_urls(css):
+    """Point the stylesheet's relative ``url()``s (fonts) at their static URLs, for inlining in a page."""
+    base = posixpath.dirname(CRITICAL_FILE)
+    return _RELATIVE_URL_RE.sub(
+        lambda m: f'url("{static(posixpath.normpath(posixpath.join(base, m.group(2))))}")', css,
+    )
+
+
+_loaded = {'path': None, 'mtime': None, 'css': {}}
+
+
+def critical_css(template_name):
+    """The critical CSS built for the template, or None; ``critical.json`` is reread when it changes."""
+    path = finders.find(CRITICAL_FILE)
+    if path is None:
+        return None
+    mtime = os.stat(path).st_mtime
+    if (path, mtime) != (_loaded['path'], _loaded['mtime']):
+        with open(path, encoding='utf-8') as f:
+            _loaded['css'] = {name: absolute_urls(entry['css']) for name, entry in json.load(f).items()}
+        _loaded['path'], _loaded['mtime'] = path, mtime
+    return _loaded['css'].get(template_name)
@@ -0,0 +1,226 @@
+"""Export the public pages as static files that any web server or CDN can serve.
+
+The pages are home, about, every page of the project list, every project
+and the project filter JSON. They are rendered through the test client, so
+each file is exactly what the app would serve, minified and with hashed
+static URLs. HTML is written to ``<path>/index.html`` and JSON to
+``<path>.json``, next to copies of ``STATIC_ROOT`` and ``MEDIA_ROOT``.
+
+Dependencies are tracked per page. Every SELECT a page runs is recorded
+together with a digest of the rows it returned. The records go to a
+manifest kept beside the output directory. A rebuild re-runs each recorded
+query once and re-renders only the pages whose rows changed. Editing a
+project re-renders its own page and the pages that list it. Adding one
+re-renders the list pages its count or ordering reaches. Everything is
+rendered again when the release, the templates or the static manifest
+change.
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.template import engines
+from django.urls import reverse
+
+from .cache import invalidate_personal_info
+from .models import Project
+from .release import STATIC_MANIFEST
+
+
+# Applied in the rendering processes: production rendering, with a private
+# cache so no page is served from a copy whose queries were not recorded.
+RENDER_SETTINGS = {
+    'DEBUG': False,
+    'ALLOWED_HOSTS': ['testserver'],
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'site-export'}},
+}
+
+
+def manifest_path(output_dir):
+    """Where the dependency manifest of ``output_dir`` is kept; it is not published with the pages."""
+    output_dir = Path(output_dir)
+    return output_dir.with_name(f'{output_dir.name}.manifest.json')
+
+
+def load_manifest(output_dir):
+    try:
+        return json.loads(manifest_path(output_dir).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    path = manifest_path(output_dir)
+    temporary = path.with_name(f'.{path.name}.tmp')
+    temporary.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding='utf-8')
+    os.replace(temporary, path)
+
+
+def build_key():
+    """Digest of everything besides the database that pages are rendered from."""
+    digest = hashlib.sha256(settings.RELEASE.encode())
+    digest.update(str(settings.HTML_MINIFY).encode())
+    digest.update((Path(settings.STATIC_ROOT) / STATIC_MANIFEST).read_bytes())
+    for engine in engines.all():
+        for directory in map(Path, engine.template_dirs):
+            for path in sorted(directory.rglob('*')):
+                if path.is_file():
+                    digest.update(str(path.relative_to(directory)).encode())
+                    digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def site_pages():
+    """URL paths of every exported page."""
+    from .views import ProjectsView
+
+    pages = [reverse('home'), reverse('about'), reverse('projects')]
+    paginator = Paginator(Project.objects.all(), ProjectsView.paginate_by)
+    pages += [reverse('projects', kwargs={'page': number}) for number in paginator.page_range[1:]]
+    pages += [
+        reverse('project_detail', kwargs={'pk': pk})
+        for pk in Project.objects.order_by('pk').values_list('pk', flat=True)
+    ]
+    pages.append(reverse('project_filter'))
+    return pages
+
+
+def output_name(url, content_type):
+    path = url.strip('/')
+    if content_type.split(';')[0].strip() == 'application/json':
+        return f'{path}.json'
+    return f'{path}/index.html' if path else 'index.html'
+
+
+def query_digest(cursor, sql, params):
+    cursor.execute(sql, params)
+    return hashlib.sha256(repr(cursor.fetchall()).encode()).hexdigest()
+
+
+def _dependencies(queries):
+    """``[sql, params, digest]`` for each distinct query, or None if one cannot be recorded."""
+    dependencies = {}
+    with connection.cursor() as cursor:
+        for sql, params in queries:
+            params = list(params) if params is not None else None
+            try:
+                key = json.dumps([sql, params])
+            except TypeError:
+                # Parameters that do not survive JSON: always re-render the page.
+                return None
+            if key not in dependencies:
+                dependencies[key] = [sql, params, query_digest(cursor, sql, params)]
+    return list(dependencies.values())
+
+
+def export_page(url, output_dir):
+    """Render ``url`` into ``output_dir``; returns its file name and the queries it depends on.
+
+    Runs with ``RENDER_SETTINGS`` applied. The page and the digests of its
+    queries are read in one transaction.
+    """
+    from django.test import Client
+
+    default_cache.clear()
+    invalidate_personal_info()
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        if not many and sql.lstrip()[:6].upper() == 'SELECT':
+            queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with transaction.atomic():
+        with connection.execute_wrapper(record):
+            response = Client().get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} answered {response.status_code} while exporting')
+        dependencies = _dependencies(queries)
+
+    name = output_name(url, response['Content-Type'])
+    target = Path(output_dir) / name
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_name(f'.{target.name}.{os.getpid()}.tmp')
+    temporary.write_bytes(response.content)
+    os.replace(temporary, target)
+    return {'file': name, 'queries': dependencies}
+
+
+def stale_pages(pages, stored):
+    """The pages to render: new ones, and those a recorded query now answers differently."""
+    current = {}
+    stale = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for url in pages:
+            entry = stored.get(url)
+            if entry is None or entry['queries'] is None:
+                stale.append(url)
+                continue
+            for sql, params, digest in entry['queries']:
+                key = json.dumps([sql, params])
+                if key not in current:
+                    current[key] = query_digest(cursor, sql, params)
+                if current[key] != digest:
+                    stale.append(url)
+                    break
+    return stale
+
+
+def remove_page(output_dir, name):
+    """Delete a page's file and the directories it leaves empty."""
+    output_dir = Path(output_dir)
+    path = output_dir / name
+    path.unlink(missing_ok=True)
+    for parent in path.parents:
+        if parent == output_dir or any(parent.iterdir()):
+            break
+        parent.rmdir()
+
+
+def sync_tree(source, target):
+    """Mirror ``source`` into ``target``, copying only new or changed files; returns the number copied."""
+    source, target = Path(source), Path(target)
+    copied = 0
+    expected = set()
+    for path in source.rglob('*'):
+        if not path.is_file():
+            continue
+        relative = path.relative_to(source)
+        expected.add(relative)
+        destination = target / relative
+        stat = path.stat()
+        try:
+            existing = destination.stat()
+        except FileNotFoundError:
+            existing = None
+        if existing is None or (existing.st_size, existing.st_mtime) != (stat.st_size, stat.st_mtime):
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(path, destination)
+            copied += 1
+    for path in sorted(target.rglob('*'), reverse=True):
+        if path.is_file() and path.relative_to(target) not in expected:
+            path.unlink()
+        elif path.is_dir() and not any(path.iterdir()):
+            path.rmdir()
+    return copied
+
+
+def sync_assets(output_dir):
+    """Copy static files and media under their URL paths; returns the number of files copied.
+
+    Roots served from another host (an absolute URL) are left out.
+    """
+    copied = 0
+    for url, root in ((settings.STATIC_URL, settings.STATIC_ROOT), (settings.MEDIA_URL, settings.MEDIA_ROOT)):
+        url = urlsplit(url)
+        if url.netloc or not Path(root).is_dir():
+            continue
+        copied += sync_tree(root, Path(output_dir) / url.path.strip('/'))
+    return copied
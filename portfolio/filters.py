@@ -0,0 +1,75 @@
+from django.db.models import Q
+from django.utils.text import slugify
+
+from .models import Project, Skill, normalize_skill_name
+
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+
+
+def parse_tech_terms(params):
+    """Read the ``tech`` filter from a QueryDict.
+
+    Accepts repeated ``tech`` parameters and comma-separated values, and
+    returns the distinct normalized terms in order together with the
+    ``match`` mode (``any`` or ``all``).
+    """
+    terms = []
+    for value in params.getlist('tech'):
+        for term in value.split(','):
+            term = normalize_skill_name(term)
+            if term and term not in terms:
+                terms.append(term)
+    match = MATCH_ALL if params.get('match') == MATCH_ALL else MATCH_ANY
+    return terms, match
+
+
+def prefix_upper_bound(prefix):
+    """The smallest string above every string that starts with ``prefix``."""
+    prefix = prefix.rstrip('\U0010ffff')
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else None
+
+
+def resolve_tech_term(term):
+    """Return the ids of the skills a term refers to.
+
+    A term matches a skill by exact slug or as a prefix of its normalized
+    name, both served by indexes. The prefix is a range rather than
+    ``startswith``, which SQLite compiles to ``LIKE ... ESCAPE`` and answers
+    with a table scan; ``search_name`` is lowercased, so the range needs no
+    case folding.
+    """
+    lookup = Q(search_name__gte=term)
+    upper_bound = prefix_upper_bound(term)
+    if upper_bound is not None:
+        lookup &= Q(search_name__lt=upper_bound)
+    slug = slugify(term)
+    if slug:
+        lookup |= Q(slug=slug)
+    return list(Skill.objects.filter(lookup).order_by().values_list('id', flat=True))
+
+
+def filter_projects_by_tech(queryset, terms, match=MATCH_ANY):
+    """Restrict ``queryset`` to projects using the skills named by ``terms``.
+
+    With ``match='any'`` a project needs one of the skills; with ``'all'`` it
+    needs a skill for every term. Each condition is an ``id IN`` subquery on
+    the tech stack table, so no join duplicates rows and no DISTINCT is needed.
+    """
+    if not terms:
+        return queryset
+    through = Project.tech_stack.through
+    skill_ids_per_term = [resolve_tech_term(term) for term in terms]
+
+    if match == MATCH_ALL:
+        for skill_ids in skill_ids_per_term:
+            queryset = queryset.filter(id__in=through.objects.filter(
+                skill_id__in=skill_ids
+            ).values('project_id'))
+        return queryset
+
+    skill_ids = {skill_id for ids in skill_ids_per_term for skill_id in ids}
+    return queryset.filter(id__in=through.objects.filter(
+        skill_id__in=skill_ids
+    ).values('project_id'))
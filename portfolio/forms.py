@@ -1,10 +1,23 @@
 from django import forms
-from django.core.mail import send_mail
 from django.conf import settings
-from .models import ContactMessage, BlogPost
+from .models import ContactMessage, BlogPost, OutboxEmail
+from .spam import issue_form_token
 
 
 class ContactForm(forms.ModelForm):
+    # Spam screen inputs: a honeypot hidden from people, and a signed
+    # timestamp of when the form was rendered.
+    website = forms.CharField(required=False, widget=forms.TextInput(attrs={
+        'autocomplete': 'off',
+        'tabindex': '-1',
+    }))
+    form_token = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.is_bound:
+            self.initial['form_token'] = issue_form_token()
+
     class Meta:
         model = ContactMessage
         fields = ['name', 'email', 'subject', 'message']
@@ -28,15 +41,15 @@ class ContactForm(forms.ModelForm):
             }),
         }
 
-    def send_email(self):
-        """Send email notification to Doni"""
-        try:
-            # Use a default from_email if EMAIL_HOST_USER is not set
-            from_email = settings.EMAIL_HOST_USER or 'noreply@portfolio.com'
-            
-            send_mail(
-                subject=f"Portfolio Contact: {self.cleaned_data['subject']}",
-                message=f"""
+    def queue_email(self, contact_message):
+        """Queue the notification email to Doni; the outbox worker delivers it"""
+        # Use a default from_email if EMAIL_HOST_USER is not set
+        from_email = settings.EMAIL_HOST_USER or 'noreply@portfolio.com'
+
+        return OutboxEmail.objects.create(
+            contact_message=contact_message,
+            subject=f"Portfolio Contact: {self.cleaned_data['subject']}",
+            body=f"""
                 New contact form submission:
                 
                 Name: {self.cleaned_data['name']}
@@ -46,18 +59,9 @@ class ContactForm(forms.ModelForm):
                 Message:
                 {self.cleaned_data['message']}
                 """,
-                from_email=from_email,
-                recipient_list=['donialston142@gmail.com'],
-                fail_silently=False,
-            )
-            return True
-        except Exception as e:
-            print(f"Email sending failed: {e}")
-            # Log the error for debugging
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Email sending failed: {e}")
-            return False
+            from_email=from_email,
+            recipients=['donialston142@gmail.com'],
+        )
 
 
 class BlogPostForm(forms.ModelForm):
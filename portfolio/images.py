@@ -0,0 +1,240 @@
+"""Resized and re-encoded derivatives of uploaded images, described in a ``<field>_renditions`` JSON field.
+
+A renditions value looks like::
+
+    {
+        'source': 'projects/shot.jpg',
+        'width': 2400, 'height': 1350,
+        'variants': [
+            {'name': 'derived/projects/shot-1a2b3c4d-320w.jpg', 'width': 320, 'height': 180, 'format': 'jpeg'},
+            {'name': 'derived/projects/shot-1a2b3c4d-320w.webp', 'width': 320, 'height': 180, 'format': 'webp'},
+            ...
+        ],
+        'color': '#3a5f8c',
+        'placeholder': 'data:image/webp;base64,...',
+    }
+
+``color`` (the dominant colour) and ``placeholder`` (a tiny blurred preview,
+inlined as a data URI) are painted while the real image loads.
+
+``source`` is the image the variants were made from, so a replaced upload is
+detected and its variants regenerated. Variant names include a digest of the
+source bytes, so encoding is idempotent: files that already exist are reused.
+Encoding runs on a background thread after the upload commits, never in the
+request that saved it.
+"""
+import base64
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageFilter, ImageOps, features
+
+
+logger = logging.getLogger(__name__)
+
+DERIVED_PREFIX = 'derived'
+# Longest side, in pixels, of the inline placeholder preview.
+PLACEHOLDER_SIZE = 16
+
+# Image fields that get derivatives, per model label.
+IMAGE_FIELDS = {
+    'portfolio.Project': ('image',),
+    'portfolio.BlogPost': ('featured_image',),
+    'portfolio.PersonalInfo': ('profile_image',),
+}
+
+# Output format -> (file extension, MIME type)
+FORMATS = {
+    'jpeg': ('jpg', 'image/jpeg'),
+    'png': ('png', 'image/png'),
+    'webp': ('webp', 'image/webp'),
+    'avif': ('avif', 'image/avif'),
+}
+
+
+def renditions_field(field_name):
+    return f'{field_name}_renditions'
+
+
+def modern_formats():
+    """The configured ``IMAGE_MODERN_FORMATS`` this Pillow build can encode, best first."""
+    return [fmt for fmt in settings.IMAGE_MODERN_FORMATS if features.check(fmt)]
+
+
+def _encode(image, fmt):
+    buffer = BytesIO()
+    if fmt == 'jpeg':
+        image.save(buffer, 'JPEG', quality=settings.IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+    elif fmt == 'webp':
+        image.save(buffer, 'WEBP', quality=settings.IMAGE_WEBP_QUALITY, method=6)
+    elif fmt == 'avif':
+        image.save(buffer, 'AVIF', quality=settings.IMAGE_AVIF_QUALITY, speed=6)
+    else:
+        image.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def dominant_color(image):
+    """The most common colour of the image after reducing it to a small palette, as ``#rrggbb``."""
+    palette = image.convert('RGB').resize((64, 64)).quantize(colors=8)
+    count, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def placeholder_data_uri(image):
+    """A blurred preview a few pixels across, as an inline data URI of a few hundred bytes."""
+    preview = image.copy()
+    preview.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    preview = preview.filter(ImageFilter.GaussianBlur(0.5))
+    buffer = BytesIO()
+    if features.check('webp'):
+        preview.save(buffer, 'WEBP', quality=40)
+        mime = FORMATS['webp'][1]
+    else:
+        preview.convert('RGB').save(buffer, 'JPEG', quality=40)
+        mime = FORMATS['jpeg'][1]
+    return f'data:{mime};base64,{base64.b64encode(buffer.getvalue()).decode()}'
+
+
+def build_renditions(fieldfile, force=False):
+    """Write resized copies of ``fieldfile`` at each ``IMAGE_WIDTHS`` below its width.
+
+    Every width is written in the original's fallback format (JPEG, or PNG
+    with transparency) and in each modern format; the full size only in the
+    modern formats, since the original itself is the fallback there.
+    """
+    storage = fieldfile.storage
+    with fieldfile.open('rb') as f:
+        data = f.read()
+    digest = hashlib.md5(data).hexdigest()[:8]
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    image.load()
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    fallback = 'png' if has_alpha else 'jpeg'
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    base, _ = os.path.splitext(fieldfile.name)
+    widths = [width for width in sorted(set(settings.IMAGE_WIDTHS)) if width < image.width]
+    variants = []
+    for width in widths + [image.width]:
+        height = max(1, round(image.height * width / image.width))
+        resized = None
+        for fmt in [fallback] + modern_formats():
+            if width == image.width and fmt == fallback:
+                continue
+            name = f'{DERIVED_PREFIX}/{base}-{digest}-{width}w.{FORMATS[fmt][0]}'
+            if force or not storage.exists(name):
+                if resized is None:
+                    resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                storage.delete(name)
+                name = storage.save(name, ContentFile(_encode(resized, fmt)))
+            variants.append({'name': name, 'width': width, 'height': height, 'format': fmt})
+
+    return {
+        'source': fieldfile.name,
+        'width': image.width,
+        'height': image.height,
+        'variants': variants,
+        'color': dominant_color(image),
+        'placeholder': placeholder_data_uri(image),
+    }
+
+
+def renditions_stale(fieldfile, renditions):
+    """Whether the renditions were made from another file, lack an available format or a placeholder."""
+    if (renditions or {}).get('source', '') != (fieldfile.name or ''):
+        return True
+    if not fieldfile or not renditions.get('width'):
+        return False
+    if 'placeholder' not in renditions:
+        return True
+    present = {variant.get('format') for variant in renditions['variants']}
+    return not set(modern_formats()) <= present
+
+
+def refresh_renditions(instance, force=False):
+    """Regenerate derivatives of the instance's images that are stale; returns whether any were.
+
+    The new renditions are written with ``update()`` so no save signals fire again.
+    Superseded derivatives are left for ``gc_media``, since rows with the same
+    image share them.
+    """
+    changed = {}
+    for field_name in IMAGE_FIELDS.get(instance._meta.label, ()):
+        fieldfile = getattr(instance, field_name)
+        current = getattr(instance, renditions_field(field_name)) or {}
+        if not force and not renditions_stale(fieldfile, current):
+            continue
+
+        renditions = {}
+        if fieldfile:
+            try:
+                renditions = build_renditions(fieldfile, force=force)
+            except (OSError, ValueError, Image.DecompressionBombError) as e:
+                logger.warning('Could not create derivatives of %s: %s', fieldfile.name, e)
+                renditions = {'source': fieldfile.name, 'variants': []}
+        setattr(instance, renditions_field(field_name), renditions)
+        changed[renditions_field(field_name)] = renditions
+
+    if changed:
+        type(instance)._default_manager.filter(pk=instance.pk).update(**changed)
+    return bool(changed)
+
+
+def needs_renditions(instance):
+    return any(
+        renditions_stale(getattr(instance, field_name), getattr(instance, renditions_field(field_name)))
+        for field_name in IMAGE_FIELDS.get(instance._meta.label, ())
+    )
+
+
+def process_renditions(label, pk, force=False):
+    """Refresh one object's derivatives and invalidate the pages showing it; returns whether any changed."""
+    from .cache import bump_content_version, invalidate_personal_info
+
+    model = apps.get_model(label)
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None or not refresh_renditions(instance, force=force):
+        return False
+    bump_content_version(model)
+    if label == 'portfolio.PersonalInfo':
+        invalidate_personal_info()
+    return True
+
+
+_executor = {'pid': None, 'pool': None}
+_executor_lock = threading.Lock()
+
+
+def _run_in_background(label, pk):
+    try:
+        process_renditions(label, pk)
+    except Exception:
+        logger.exception('Could not create derivatives for %s %s', label, pk)
+    finally:
+        connections.close_all()
+
+
+def schedule_renditions(instance):
+    """Encode the instance's derivatives on this process's background thread once the save commits."""
+    label, pk = instance._meta.label, instance.pk
+
+    def submit():
+        with _executor_lock:
+            # Threads do not survive a fork, so each process starts its own pool.
+            if _executor['pid'] != os.getpid():
+                _executor['pool'] = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-derivatives')
+                _executor['pid'] = os.getpid()
+            _executor['pool'].submit(_run_in_background, label, pk)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,63 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_timings = ContextVar('portfolio_request_timings', default=None)
+
+
+class RequestTimings:
+    """Durations (in seconds) and call counts collected while serving one request."""
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+
+    def add(self, name, duration, count=1):
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+        self.counts[name] = self.counts.get(name, 0) + count
+
+
+def start_request_timings():
+    """Start collecting timings for the current request; returns the collector and a reset token."""
+    timings = RequestTimings()
+    return timings, _timings.set(timings)
+
+
+def stop_request_timings(token):
+    _timings.reset(token)
+
+
+def current_timings():
+    return _timings.get()
+
+
+@contextmanager
+def record(name):
+    """Add the duration of the block to ``name`` when the request is being timed."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+class TimedCache:
+    """Proxy around a Django cache that records the time spent in each call."""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def __getattr__(self, name):
+        attr = getattr(self._backend, name)
+        if not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            with record('cache'):
+                return attr(*args, **kwargs)
+        return timed
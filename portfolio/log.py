@@ -0,0 +1,174 @@
+"""Non-blocking logging: request threads enqueue records, a background thread writes them."""
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+
+# Attributes every LogRecord has; anything else was passed through ``extra``.
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra`` fields of the record."""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class AsyncLogHandler(logging.Handler):
+    """Write log records to stderr, or to a file, from a background thread.
+
+    ``emit`` only puts the record on a bounded queue. When the queue is full
+    the record is dropped and counted rather than blocking the request; the
+    number of dropped records is written to the log once there is room again.
+    The writer thread drains up to ``batch_size`` records at a time, or
+    whatever arrived within ``flush_interval`` seconds, and writes them with
+    a single call.
+
+    Several worker processes may share the file, so the handler never
+    rotates it: like ``WatchedFileHandler`` it reopens the file once it has
+    been moved or removed, leaving rotation to a single external process such
+    as logrotate.
+    """
+
+    def __init__(self, filename=None, queue_size=10000, batch_size=500, flush_interval=1.0):
+        super().__init__()
+        self.filename = os.fspath(filename) if filename else None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._stream = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def emit(self, record):
+        self._ensure_writer()
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def prepare(self, record):
+        """Resolve everything that may change after the call, so the writer sees a snapshot.
+
+        Works on a copy, like ``QueueHandler.prepare``: handlers that run after
+        this one still get the record's ``args`` and ``exc_info``.
+        """
+        try:
+            record = copy.copy(record)
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+        except Exception:
+            self.handleError(record)
+        return record
+
+    def _ensure_writer(self):
+        # The writer thread does not survive a fork (e.g. gunicorn --preload),
+        # so each process starts its own on first use.
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._stream = None
+            self._thread = threading.Thread(target=self._run, name='async-log-writer', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0.001)))
+                except queue.Empty:
+                    break
+            stop = None in batch
+            self._write([record for record in batch if record is not None])
+            if stop:
+                return
+
+    def _write(self, records):
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        with self._dropped_lock:
+            dropped = self.dropped - self._reported_dropped
+            self._reported_dropped = self.dropped
+        if dropped:
+            lines.append(self.format(logging.LogRecord(
+                __name__, logging.WARNING, __file__, 0,
+                'Dropped %d log records: the logging queue was full', (dropped,), None,
+            )))
+        if not lines:
+            return
+        data = '\n'.join(lines) + '\n'
+        try:
+            self._open().write(data)
+            self._stream.flush()
+        except OSError:
+            if records:
+                self.handleError(records[0])
+
+    def _open(self):
+        if self.filename is None:
+            self._stream = sys.stderr
+            return self._stream
+        if self._stream is not None:
+            try:
+                current = os.stat(self.filename)
+                opened = os.fstat(self._stream.fileno())
+                moved = (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+            except FileNotFoundError:
+                moved = True
+            if moved:
+                self._stream.close()
+                self._stream = None
+        if self._stream is None:
+            os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+            self._stream = open(self.filename, 'a', encoding='utf-8')
+        return self._stream
+
+    def close(self):
+        """Flush queued records and stop the writer thread."""
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            self.queue.put(None)
+            thread.join(timeout=5)
+        if self._stream is not None and self.filename is not None:
+            self._stream.close()
+        self._stream = None
+        super().close()
@@ -0,0 +1,229 @@
+import itertools
+import json
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from portfolio.models import Project, Skill
+from portfolio.spam import issue_form_token
+
+
+# Metrics compared against a baseline, and whether higher values are better.
+COMPARED_METRICS = {
+    'throughput_rps': True,
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'queries_per_request': False,
+}
+# Scenarios that write to the database. Each of their requests runs in a
+# transaction that is rolled back, so no contact message or outbox email
+# is ever committed, seen by an outbox worker or sent.
+WRITE_SCENARIOS = {'contact_post', 'contact_spam'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every public endpoint with concurrent clients against the '
+        'current (ideally seeded) database and report latency, throughput, '
+        'queries and bytes per request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per endpoint')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--only', nargs='*', help='Only run the named endpoints')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='JSON results of a previous run to compare against')
+        parser.add_argument(
+            '--threshold', type=float, default=0.10,
+            help='Allowed relative regression against the baseline (default 10%%)',
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.cold = options['cold']
+        self.run_id = time.time_ns()
+        scenarios = self.scenarios()
+        if options['only']:
+            scenarios = {name: scenarios[name] for name in options['only'] if name in scenarios}
+        if not scenarios:
+            raise CommandError('No endpoints to benchmark.')
+
+        results = {}
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            EMAIL_OUTBOX_THREAD=False,
+            # Every benchmark client shares one address; measure the views, not the limiter.
+            RATE_LIMIT_ENABLED=False,
+        ):
+            for name, request in scenarios.items():
+                rollback = name in WRITE_SCENARIOS
+                for _ in range(options['warmup']):
+                    self.run_request(request, rollback)
+                results[name] = self.run_scenario(request, options['requests'], options['concurrency'], rollback)
+                self.report(name, results[name])
+
+        report = {
+            'meta': {
+                'timestamp': datetime.now(dt_timezone.utc).isoformat(),
+                'release': settings.RELEASE,
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'cold': self.cold,
+                'projects': Project.objects.count(),
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['threshold'])
+
+    def scenarios(self):
+        """Requests to run per endpoint, as ``name -> callable(client)``."""
+        project_ids = list(Project.objects.values_list('id', flat=True)[:1000])
+        if not project_ids:
+            raise CommandError('The database has no projects; run seed_data first.')
+        popular_skill = Skill.objects.filter(is_active=True).order_by('order').first()
+        tech = popular_skill.slug if popular_skill else 'python'
+        projects_url = reverse('projects')
+        filter_url = reverse('project_filter')
+        contact_url = reverse('contact')
+        rng = self.rng
+        sequence = itertools.count()
+        # A token issued a minute ago passes the spam screen's fill-time check,
+        # and the sequence number keeps each message out of its duplicate window.
+        form_token = issue_form_token(time.time() - 60)
+
+        def contact_submission(number):
+            return {
+                'name': 'Benchmark',
+                'email': 'benchmark@example.com',
+                'subject': f'Benchmark message {number}',
+                'message': f'Sent by the benchmark command ({self.run_id}-{number}).',
+                'form_token': form_token,
+            }
+
+        return {
+            'home': lambda client: client.get(reverse('home')),
+            'about': lambda client: client.get(reverse('about')),
+            'projects': lambda client: client.get(projects_url),
+            'projects_page': lambda client: client.get(projects_url, {'page': rng.randint(1, 5)}),
+            'projects_tech': lambda client: client.get(projects_url, {'tech': tech}),
+            'project_detail': lambda client: client.get(
+                reverse('project_detail', args=[rng.choice(project_ids)])
+            ),
+            'contact_get': lambda client: client.get(contact_url),
+            'contact_post': lambda client: client.post(contact_url, contact_submission(next(sequence))),
+            'contact_spam': lambda client: client.post(
+                contact_url, {**contact_submission(next(sequence)), 'website': 'http://spam.example.com'},
+            ),
+            'project_filter': lambda client: client.get(filter_url),
+            'project_filter_tech': lambda client: client.get(filter_url, {'tech': tech}),
+        }
+
+    def run_request(self, request, rollback=False):
+        """Run one request as a fresh anonymous visitor and measure it.
+
+        With ``rollback`` the request runs in a transaction that is rolled
+        back, and its on-commit callbacks are discarded.
+        """
+        if self.cold:
+            cache.clear()
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            # The view's own transaction becomes a savepoint inside the
+            # rollback one; it is not a query the view would run on its own.
+            if not (rollback and 'SAVEPOINT' in sql):
+                queries.append(sql)
+            return execute(sql, params, many, context)
+
+        client = Client()
+        with transaction.atomic() if rollback else nullcontext():
+            with connection.execute_wrapper(count_query):
+                start = time.perf_counter()
+                response = request(client)
+                elapsed = time.perf_counter() - start
+            if rollback:
+                transaction.set_rollback(True)
+        return elapsed, len(queries), len(response.content), response.status_code
+
+    def run_scenario(self, request, total, concurrency, rollback=False):
+        def worker(_):
+            try:
+                return self.run_request(request, rollback)
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = list(executor.map(worker, range(total)))
+        wall = time.perf_counter() - start
+
+        latencies = [sample[0] * 1000 for sample in samples]
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        return {
+            'requests': total,
+            'errors': sum(1 for sample in samples if sample[3] >= 500),
+            'throughput_rps': round(total / wall, 2),
+            'p50_ms': round(cuts[49], 3),
+            'p95_ms': round(cuts[94], 3),
+            'p99_ms': round(cuts[98], 3),
+            'queries_per_request': round(statistics.mean(sample[1] for sample in samples), 2),
+            'bytes_per_response': round(statistics.mean(sample[2] for sample in samples)),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<22} {result["throughput_rps"]:>9.1f} req/s  '
+            f'p50 {result["p50_ms"]:>8.2f} ms  p95 {result["p95_ms"]:>8.2f} ms  '
+            f'p99 {result["p99_ms"]:>8.2f} ms  {result["queries_per_request"]:>6.1f} queries  '
+            f'{result["bytes_per_response"]:>8} bytes'
+        )
+
+    def compare(self, results, baseline_path, threshold):
+        with open(baseline_path) as f:
+            baseline = json.load(f)['results']
+
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            for metric, higher_is_better in COMPARED_METRICS.items():
+                before, after = previous.get(metric), result[metric]
+                if before is None:
+                    continue
+                if before == 0:
+                    change = float('inf') if after > 0 else 0.0
+                else:
+                    change = (after - before) / before
+                if (change < -threshold) if higher_is_better else (change > threshold):
+                    regressions.append(f'{name}.{metric}: {before} -> {after} ({change:+.1%})')
+
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            raise CommandError(f'{len(regressions)} metric(s) regressed by more than {threshold:.0%}.')
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
@@ -0,0 +1,117 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from portfolio import spam
+
+
+HAM_WORDS = (
+    'hi project django python role team interview portfolio freelance work backend api '
+    'question available contract opportunity experience react hello thanks call next week '
+    'startup build feature database deploy schedule review collaboration position remote'
+).split()
+SPAM_WORDS = (
+    'seo backlinks ranking casino crypto bitcoin loan cheap offer guaranteed click http '
+    'www traffic promotion discount winner prize investment profit marketing followers buy'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-submission cost of each contact spam screen layer '
+        'and of the whole screen, on deterministic synthetic messages.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--training-size', type=int, default=500,
+            help='Synthetic messages of each kind to train a classifier on when none is stored',
+        )
+
+    def handle(self, *args, **options):
+        # The duplicate layer records every submission in the cache; keep the
+        # run's keys out of the site's shared cache, where they would cull
+        # live pages, content versions and rate limit state.
+        private_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'benchmark-spam-screen',
+            'OPTIONS': {'MAX_ENTRIES': 2 * options['iterations'] + 1},
+        }}
+        with override_settings(CACHES=private_cache):
+            self.run(options)
+        self.stdout.write('The duplicate layer was measured against a private in-memory cache.')
+
+    def run(self, options):
+        self.rng = random.Random(options['seed'])
+        iterations = options['iterations']
+        classifier = spam.get_classifier()
+        if classifier is None or not classifier.ready:
+            size = options['training_size']
+            classifier = spam.NaiveBayes.train(
+                [self.message(SPAM_WORDS) for _ in range(size)],
+                [self.message(HAM_WORDS) for _ in range(size)],
+            )
+            self.stdout.write(f'Using a synthetic classifier trained on {size} + {size} messages.')
+
+        run_id = time.time_ns()
+        token = spam.issue_form_token(time.time() - 60)
+        submissions = [
+            {
+                'subject': 'Hello',
+                'message': f'{self.message(HAM_WORDS)} {run_id}-{number}',
+                'form_token': token,
+                'website': '',
+            }
+            for number in range(iterations)
+        ]
+        texts = [spam.message_text(data['subject'], data['message']) for data in submissions]
+
+        layers = {
+            'honeypot': lambda i: spam.honeypot_filled(submissions[i]),
+            'fill_time': lambda i: spam.fill_time_problem(token),
+            'duplicate': lambda i: spam.seen_recently(submissions[i]),
+            'classifier': lambda i: classifier.spam_probability(texts[i]),
+        }
+        for name, layer in layers.items():
+            self.report(name, self.measure(layer, iterations))
+
+        # Fresh content so the duplicate layer does not reject the full-screen run.
+        for data in submissions:
+            data['message'] += '-screen'
+        verdicts = []
+        timings = self.measure(
+            lambda i: verdicts.append(spam.screen(submissions[i], classifier=classifier)), iterations,
+        )
+        self.report('screen (accepted)', timings)
+        rejected = sum(1 for verdict in verdicts if verdict)
+        self.stdout.write(f'{rejected} of {iterations} legitimate messages were rejected.')
+
+        held_out = [self.message(SPAM_WORDS) for _ in range(1000)]
+        caught = sum(1 for text in held_out if classifier.spam_probability(text) >= settings.SPAM_THRESHOLD)
+        self.stdout.write(f'Classifier flags {caught} of {len(held_out)} synthetic spam messages.')
+
+    def message(self, words):
+        vocabulary = words + HAM_WORDS[:10]
+        return ' '.join(self.rng.choice(vocabulary) for _ in range(self.rng.randint(8, 40)))
+
+    @staticmethod
+    def measure(layer, iterations):
+        timings = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            layer(i)
+            timings.append((time.perf_counter() - start) * 1e6)
+        return timings
+
+    def report(self, name, timings):
+        cuts = statistics.quantiles(timings, n=100, method='inclusive')
+        self.stdout.write(
+            f'{name:<20} mean {statistics.mean(timings):>8.1f} µs  '
+            f'p50 {cuts[49]:>8.1f} µs  p99 {cuts[98]:>8.1f} µs'
+        )
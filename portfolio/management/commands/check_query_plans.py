@@ -0,0 +1,58 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from portfolio import queries
+from portfolio.models import (
+    BlogPost, Certification, ContactMessage, Education, OutboxEmail, Project, Skill,
+)
+from portfolio.outbox import DELIVERY_BATCH_SIZE
+
+
+# The list queries behind the public views and the admin, as the views run them.
+ACCESS_PATHS = {
+    'home: featured projects': lambda: queries.featured_projects(),
+    'projects: project page': lambda: Project.objects.all()[:6],
+    'about: active skills': lambda: Skill.objects.filter(is_active=True),
+    'about: education': lambda: Education.objects.all(),
+    'about: active certifications': lambda: Certification.objects.filter(is_active=True),
+    'blog: published posts': lambda: BlogPost.objects.filter(published=True)[:10],
+    'admin: contact messages': lambda: ContactMessage.objects.all()[:100],
+    'outbox: due emails': lambda: OutboxEmail.objects.filter(
+        status=OutboxEmail.PENDING, next_attempt_at__lte=timezone.now(),
+    ).order_by('next_attempt_at')[:DELIVERY_BATCH_SIZE],
+}
+
+# A full table scan combined with a separate sort step, per database vendor.
+FULL_SCAN_PATTERNS = {
+    'sqlite': (re.compile(r'\bSCAN \w+$', re.M), re.compile(r'TEMP B-TREE FOR ORDER BY')),
+    'postgresql': (re.compile(r'Seq Scan'), re.compile(r'\bSort\b')),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Fail when a view query falls back to a full table scan plus sort. '
+        'Run it against a database seeded with a realistic volume of rows.'
+    )
+
+    def handle(self, *args, **options):
+        patterns = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if patterns is None:
+            raise CommandError(f'Query plan checks are not supported on {connection.vendor}.')
+
+        failures = []
+        for name, build_queryset in ACCESS_PATHS.items():
+            plan = build_queryset().explain()
+            if all(pattern.search(plan) for pattern in patterns):
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}: full scan + sort'))
+                self.stdout.write(plan)
+            else:
+                self.stdout.write(f'{name}: ok')
+
+        if failures:
+            raise CommandError(f'{len(failures)} access path(s) scan and sort the whole table.')
+        self.stdout.write(self.style.SUCCESS('All access paths use an index.'))
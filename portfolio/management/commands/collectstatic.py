@@ -0,0 +1,30 @@
+from django.contrib.staticfiles.management.commands.collectstatic import Command as CollectStaticCommand
+from django.core.management import call_command
+
+from portfolio.assets import NODE_MODULES
+
+
+class Command(CollectStaticCommand):
+    """``collectstatic`` that first builds the stylesheet, fonts and icons into static/dist.
+
+    Without ``node_modules`` (no Node.js on the host) the build is skipped with
+    a warning, and pages fall back to the CDN assets.
+    """
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--skip-build', action='store_true',
+            help='Collect static/dist as it is instead of running build_assets first',
+        )
+
+    def handle(self, **options):
+        if not options['skip_build']:
+            if NODE_MODULES.is_dir():
+                call_command('build_assets', verbosity=options['verbosity'])
+            else:
+                self.stderr.write(self.style.WARNING(
+                    f'{NODE_MODULES} is missing, so the stylesheet was not built; pages will '
+                    'use the CDN assets. Run "npm install" first to build it.'
+                ))
+        return super().handle(**options)
@@ -0,0 +1,70 @@
+import time
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from portfolio.images import IMAGE_FIELDS, renditions_field
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete uploaded files and image derivatives that no model row references. '
+        'Recent files are kept, since their rows may not have been saved yet.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='List what would be deleted without deleting it')
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Only delete files last modified at least this many seconds ago (default: 3600)',
+        )
+
+    def handle(self, *args, **options):
+        if not default_storage.exists(''):
+            self.stdout.write('No media has been stored yet.')
+            return
+        referenced = self.referenced_names()
+        cutoff = time.time() - options['min_age']
+        deleted, freed = 0, 0
+        for name in self.stored_names():
+            if name in referenced or default_storage.get_modified_time(name).timestamp() > cutoff:
+                continue
+            size = default_storage.size(name)
+            if options['dry_run']:
+                self.stdout.write(f'Would delete {name} ({size} bytes)')
+            else:
+                default_storage.delete(name)
+            deleted += 1
+            freed += size
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {deleted} unreferenced files ({freed / 1024 / 1024:.1f} MB); {len(referenced)} referenced.'
+        ))
+
+    @staticmethod
+    def referenced_names():
+        names = set()
+        for model in apps.get_models():
+            for field in model._meta.concrete_fields:
+                if isinstance(field, models.FileField):
+                    names.update(
+                        model._default_manager.exclude(**{field.name: ''})
+                        .exclude(**{f'{field.name}__isnull': True})
+                        .values_list(field.name, flat=True)
+                    )
+        for label, field_names in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            for field_name in field_names:
+                for renditions in model._default_manager.values_list(renditions_field(field_name), flat=True):
+                    names.update(variant['name'] for variant in (renditions or {}).get('variants', ()))
+        return names
+
+    def stored_names(self, directory=''):
+        directories, files = default_storage.listdir(directory)
+        for name in files:
+            yield f'{directory}{name}'
+        for subdirectory in directories:
+            yield from self.stored_names(f'{directory}{subdirectory}/')
@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+
+from portfolio.images import IMAGE_FIELDS, needs_renditions, process_renditions
+
+
+def _setup_worker():
+    # Needed where workers are spawned rather than forked.
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Create resized and AVIF/WebP derivatives for uploaded images that lack '
+        'up-to-date ones, encoding in parallel across CPU cores'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-encode every derivative')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Encoding processes (default: one per CPU core)',
+        )
+
+    def handle(self, *args, **options):
+        jobs = []
+        for label, field_names in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            has_image = Q()
+            for field_name in field_names:
+                has_image |= Q(**{f'{field_name}__gt': ''})
+            for instance in model._default_manager.filter(has_image).iterator():
+                if options['force'] or needs_renditions(instance):
+                    jobs.append((label, instance.pk))
+
+        if not jobs:
+            self.stdout.write(self.style.SUCCESS('All derivatives are up to date.'))
+            return
+
+        workers = max(1, min(options['workers'], len(jobs)))
+        self.stdout.write(f'Encoding derivatives for {len(jobs)} objects with {workers} workers...')
+        # Forked workers must not share the parent's database connections.
+        connections.close_all()
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_setup_worker) as pool:
+            results = list(pool.map(
+                process_renditions,
+                [label for label, pk in jobs],
+                [pk for label, pk in jobs],
+                [options['force']] * len(jobs),
+            ))
+        self.stdout.write(self.style.SUCCESS(f'Created derivatives for {sum(results)} objects.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from portfolio.related import REBUILD_BATCH_SIZE, rebuild_related
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed related-projects ranking for every project'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        count = rebuild_related(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt related projects for {count} projects.')
+        )
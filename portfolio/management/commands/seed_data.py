@@ -0,0 +1,233 @@
+import random
+from itertools import accumulate
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from portfolio.cache import bump_content_version
+from portfolio.models import (
+    BlogPost, Certification, ContactMessage, Education, OutboxEmail, PersonalInfo,
+    Project, RelatedProject, Skill, normalize_skill_name,
+)
+from portfolio.related import rebuild_related
+
+
+BASE_SKILLS = [
+    'Python', 'Django', 'Flask', 'FastAPI', 'JavaScript', 'TypeScript', 'React',
+    'Vue.js', 'Node.js', 'HTML5', 'CSS3', 'Tailwind CSS', 'PostgreSQL', 'MySQL',
+    'SQLite', 'Redis', 'Docker', 'Kubernetes', 'AWS', 'Git', 'Linux', 'Celery',
+    'GraphQL', 'REST APIs', 'Pandas', 'NumPy', 'Go', 'Rust',
+]
+CATEGORIES = ['frontend', 'backend', 'database', 'tools', 'other']
+WORDS = [
+    'real-time', 'dashboard', 'platform', 'api', 'tracker', 'analytics', 'portal',
+    'engine', 'service', 'manager', 'pipeline', 'scheduler', 'chat', 'commerce',
+    'inventory', 'weather', 'budget', 'learning', 'health', 'travel', 'music',
+    'recipe', 'fitness', 'booking', 'social', 'search', 'monitoring', 'notes',
+]
+EPOCH = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+SPAN_SECONDS = 5 * 365 * 24 * 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Generate a large, deterministic synthetic dataset for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=50_000)
+        parser.add_argument('--skills', type=int, default=500)
+        parser.add_argument('--messages', type=int, default=1_000_000)
+        parser.add_argument('--posts', type=int, default=5_000)
+        parser.add_argument('--education', type=int, default=20)
+        parser.add_argument('--certifications', type=int, default=200)
+        parser.add_argument('--min-tech', type=int, default=2, help='Minimum skills per project')
+        parser.add_argument('--max-tech', type=int, default=8, help='Maximum skills per project')
+        parser.add_argument('--featured-ratio', type=float, default=0.02)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--clear', action='store_true', help='Delete existing content first')
+        parser.add_argument('--skip-related', action='store_true', help='Do not rebuild related projects')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+
+        if options['clear']:
+            self.stdout.write('Deleting existing content...')
+            self.clear()
+
+        PersonalInfo.objects.get_or_create(
+            name='Doni Alston G',
+            defaults={'bio': 'Synthetic profile for load testing.', 'email': 'doni.alston@example.com'},
+        )
+
+        skill_ids = self.create_skills(options['skills'])
+        self.create_projects(
+            options['projects'], skill_ids,
+            options['min_tech'], options['max_tech'], options['featured_ratio'],
+        )
+        self.create_education(options['education'])
+        self.create_certifications(options['certifications'])
+        self.create_posts(options['posts'])
+        self.create_messages(options['messages'])
+
+        if not options['skip_related']:
+            self.stdout.write('Rebuilding related projects...')
+            rebuild_related()
+
+        # Bulk inserts bypass the save signals, so invalidate cached pages here.
+        for model in (Project, Skill, Education, Certification, PersonalInfo):
+            bump_content_version(model)
+
+        self.stdout.write(self.style.SUCCESS('Successfully seeded synthetic data!'))
+
+    def clear(self):
+        """Empty the content tables with one DELETE each.
+
+        QuerySet.delete() would send pre/post_delete for every row, and the
+        handlers would bump content versions and schedule a related-projects
+        refresh per project. Raw deletes send no signals, so the rows that
+        point at the deleted ones are cleared first, and the versions are
+        bumped once after seeding.
+        """
+        with transaction.atomic():
+            OutboxEmail.objects.filter(contact_message__isnull=False).update(contact_message=None)
+            for model in (
+                RelatedProject, Project.tech_stack.through, Project, Skill,
+                ContactMessage, BlogPost, Certification, Education,
+            ):
+                model.objects.all()._raw_delete(model.objects.db)
+
+    def timestamp(self):
+        return EPOCH + timedelta(seconds=self.rng.randrange(SPAN_SECONDS))
+
+    def words(self, count):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(count))
+
+    def bulk_insert(self, model, objects):
+        """Insert ``objects`` in chunked transactions and return their ids."""
+        ids = []
+        for start in range(0, len(objects), self.batch_size):
+            chunk = objects[start:start + self.batch_size]
+            with transaction.atomic():
+                created = model.objects.bulk_create(chunk)
+                if connection.features.can_return_rows_from_bulk_insert:
+                    ids.extend(obj.pk for obj in created)
+                else:
+                    ids.extend(reversed(model.objects.order_by('-pk').values_list('pk', flat=True)[:len(chunk)]))
+        return ids
+
+    def generate(self, model, count, build):
+        """Build and insert ``count`` rows, ``batch_size`` at a time."""
+        ids = []
+        for start in range(0, count, self.batch_size):
+            objects = [build(index) for index in range(start, min(count, start + self.batch_size))]
+            ids.extend(self.bulk_insert(model, objects))
+            self.stdout.write(f'  {model.__name__}: {len(ids)}/{count}')
+        return ids
+
+    def create_skills(self, count):
+        offset = Skill.objects.count()
+
+        def build(index):
+            name = BASE_SKILLS[index] if index < len(BASE_SKILLS) else f'Skill {offset + index}'
+            return Skill(
+                name=name,
+                slug=slugify(name),
+                search_name=normalize_skill_name(name),
+                proficiency=self.rng.randint(40, 100) / 10,
+                category=self.rng.choice(CATEGORIES),
+                order=index,
+                is_active=self.rng.random() < 0.9,
+            )
+
+        return self.generate(Skill, count, build)
+
+    def create_projects(self, count, skill_ids, min_tech, max_tech, featured_ratio):
+        # Zipf-like popularity: a few skills appear on most projects, as in real data.
+        cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(skill_ids))))
+        through = Project.tech_stack.through
+
+        def build(index):
+            return Project(
+                title=self.words(3).title(),
+                description=self.words(20).capitalize() + '.',
+                long_description=self.words(80).capitalize() + '.',
+                github_url=f'https://github.com/example/project-{index}',
+                featured=self.rng.random() < featured_ratio,
+                created_at=self.timestamp(),
+                order=self.rng.randrange(100),
+            )
+
+        for start in range(0, count, self.batch_size):
+            objects = [build(index) for index in range(start, min(count, start + self.batch_size))]
+            project_ids = self.bulk_insert(Project, objects)
+            links = []
+            for project_id in project_ids:
+                fan_out = min(len(skill_ids), self.rng.randint(min_tech, max_tech))
+                chosen = set()
+                while len(chosen) < fan_out:
+                    chosen.add(self.rng.choices(skill_ids, cum_weights=cum_weights)[0])
+                links.extend(through(project_id=project_id, skill_id=skill_id) for skill_id in sorted(chosen))
+            self.bulk_insert(through, links)
+            self.stdout.write(f'  Project: {start + len(project_ids)}/{count}')
+
+    def create_education(self, count):
+        def build(index):
+            start = date(2000, 1, 1) + timedelta(days=self.rng.randrange(8000))
+            return Education(
+                institution=f'{self.words(2).title()} University',
+                degree=f'{self.rng.choice(["BSc", "MSc", "PhD"])} {self.words(2).title()}',
+                start_date=start,
+                end_date=start + timedelta(days=self.rng.randrange(700, 1800)),
+                description=self.words(30),
+                order=index,
+            )
+
+        return self.generate(Education, count, build)
+
+    def create_certifications(self, count):
+        def build(index):
+            return Certification(
+                title=f'{self.words(2).title()} Certification',
+                issuer=f'{self.words(1).title()} Institute',
+                issue_date=date(2015, 1, 1) + timedelta(days=self.rng.randrange(3650)),
+                credential_id=f'CERT-{index:06d}',
+                description=self.words(20),
+                is_active=self.rng.random() < 0.8,
+                order=index,
+            )
+
+        return self.generate(Certification, count, build)
+
+    def create_posts(self, count):
+        offset = BlogPost.objects.count()
+
+        def build(index):
+            title = self.words(5).title()
+            return BlogPost(
+                title=title,
+                slug=f'{slugify(title)}-{offset + index}',
+                content=' '.join(self.words(12) + '.' for _ in range(20)),
+                excerpt=self.words(25),
+                created_at=self.timestamp(),
+                published=self.rng.random() < 0.8,
+                featured=self.rng.random() < 0.05,
+                tags=', '.join(self.rng.sample(WORDS, 3)),
+            )
+
+        return self.generate(BlogPost, count, build)
+
+    def create_messages(self, count):
+        def build(index):
+            return ContactMessage(
+                name=f'Visitor {index}',
+                email=f'visitor{index}@example.com',
+                subject=self.words(4).capitalize(),
+                message=self.words(self.rng.randint(10, 120)).capitalize(),
+                created_at=self.timestamp(),
+                is_read=self.rng.random() < 0.6,
+            )
+
+        return self.generate(ContactMessage, count, build)
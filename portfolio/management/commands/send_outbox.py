@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from portfolio.outbox import DELIVERY_BATCH_SIZE, deliver_all
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbox emails, once or continuously with --loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DELIVERY_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep polling for due emails')
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Seconds between polls with --loop (default EMAIL_OUTBOX_POLL_INTERVAL)',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or settings.EMAIL_OUTBOX_POLL_INTERVAL
+        while True:
+            close_old_connections()
+            count = deliver_all(batch_size=options['batch_size'])
+            if count or not options['loop']:
+                self.stdout.write(f'Attempted delivery of {count} emails.')
+            if not options['loop']:
+                return
+            time.sleep(interval)
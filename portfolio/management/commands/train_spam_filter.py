@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from portfolio.spam import train_classifier
+
+
+class Command(BaseCommand):
+    help = 'Retrain the contact form spam classifier from messages marked as spam in the admin'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ham-limit', type=int, default=settings.SPAM_TRAINING_HAM_LIMIT,
+            help='Most recent non-spam messages to train on',
+        )
+
+    def handle(self, *args, **options):
+        model = train_classifier(ham_limit=options['ham_limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Trained on {model.spam_messages} spam and {model.ham_messages} other messages '
+            f'({len(model.weights)} tokens).'
+        ))
@@ -0,0 +1,227 @@
+"""In-process metrics registry shared across worker processes through snapshot files.
+
+Each process keeps its counters and histograms in memory and periodically
+writes them to a snapshot file in ``METRICS_DIR``. The ``/metrics`` view merges the
+snapshots of every process, so totals are correct across gunicorn workers.
+
+Only web server processes write snapshots (see ``PortfolioConfig.ready``), so
+management commands never add to the totals. Snapshots of processes that have
+exited are folded into ``totals.json`` and deleted on the next scrape, which
+keeps the directory to one file per live worker.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS = {
+    'portfolio_requests_total': ('counter', 'HTTP requests by URL name, method and status.'),
+    'portfolio_request_duration_seconds': ('histogram', 'Request latency by URL name.'),
+    'portfolio_db_queries_total': ('counter', 'Database queries executed by URL name.'),
+    'portfolio_cache_lookups_total': ('counter', 'Page cache lookups by result (hit, miss, stale, coalesced).'),
+    'portfolio_emails_total': ('counter', 'Outbox email delivery attempts by outcome (sent, retry, failed).'),
+    'portfolio_contact_submissions_total': ('counter', 'Contact form submissions by result (accepted, invalid, spam_<layer>).'),
+    'portfolio_ratelimit_requests_total': ('counter', 'Rate-limited requests by URL name and result (allowed, limited_per_ip, limited_global).'),
+    'portfolio_ratelimit_fallbacks_total': ('counter', 'Rate limit checks that fell back to in-process buckets.'),
+    'portfolio_html_bytes_saved_total': ('counter', 'Bytes removed from HTML responses by minification, by URL name.'),
+    'portfolio_compressed_responses_total': ('counter', 'Compressed responses by encoding and source (live, compressed, cached).'),
+}
+
+
+TOTALS_FILE = 'totals.json'
+LOCK_FILE = '.lock'
+
+
+def _key(name, labels):
+    return json.dumps([name, sorted((labels or {}).items())])
+
+
+def _snapshot_pid(filename):
+    """The pid in a ``<pid>-<time>.json`` snapshot name, or None for other files."""
+    pid, sep, rest = filename.partition('-')
+    if not sep or not rest.endswith('.json') or not pid.isdigit():
+        return None
+    return int(pid)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(counters, histograms, snapshot):
+    for key, value in snapshot['counters'].items():
+        counters[key] = counters.get(key, 0) + value
+    for key, value in snapshot['histograms'].items():
+        merged = histograms.setdefault(key, {
+            'buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'sum': 0.0, 'count': 0,
+        })
+        merged['buckets'] = [a + b for a, b in zip(merged['buckets'], value['buckets'])]
+        merged['sum'] += value['sum']
+        merged['count'] += value['count']
+
+
+def _write(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class MetricsRegistry:
+    def __init__(self, directory, flush_interval):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._last_flush = 0.0
+        self._pid = None
+        self._filename = None
+        self.enabled = False
+
+    def enable(self):
+        """Write snapshots from this process; only web server processes do."""
+        self.enabled = True
+
+    def inc(self, name, labels=None, value=1):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    'buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'sum': 0.0, 'count': 0,
+                }
+            histogram['buckets'][bisect_left(LATENCY_BUCKETS, value)] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def flush(self, force=False):
+        """Write this process's snapshot, at most once per ``flush_interval``."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        with self._lock:
+            snapshot = json.dumps({'counters': self._counters, 'histograms': self._histograms})
+        if self._pid != os.getpid():
+            # Unique per process lifetime: workers forked from a preloaded
+            # master get their own file, and a recycled pid never overwrites
+            # the totals of a worker that has exited.
+            self._pid = os.getpid()
+            self._filename = f'{self._pid}-{time.time_ns()}.json'
+        os.makedirs(self.directory, exist_ok=True)
+        _write(os.path.join(self.directory, self._filename), snapshot)
+
+    @contextmanager
+    def _directory_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, LOCK_FILE), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _compact(self):
+        """Fold the snapshots of exited processes into the totals file and delete them."""
+        totals_path = os.path.join(self.directory, TOTALS_FILE)
+        totals = _read_snapshot(totals_path) or {'counters': {}, 'histograms': {}}
+        exited = []
+        for filename in os.listdir(self.directory):
+            pid = _snapshot_pid(filename)
+            if pid is None or _pid_alive(pid):
+                continue
+            snapshot = _read_snapshot(os.path.join(self.directory, filename))
+            if snapshot is not None:
+                _merge(totals['counters'], totals['histograms'], snapshot)
+            exited.append(filename)
+        if exited:
+            _write(totals_path, json.dumps(totals))
+            for filename in exited:
+                os.remove(os.path.join(self.directory, filename))
+
+    def collect(self):
+        """Merge the totals and the snapshots of every live process into ``(counters, histograms)``."""
+        self.flush(force=True)
+        counters, histograms = {}, {}
+        # Scrapes serialize on a lock file so a snapshot being folded into
+        # the totals is never counted twice.
+        with self._directory_lock():
+            self._compact()
+            for filename in os.listdir(self.directory):
+                if not filename.endswith('.json'):
+                    continue
+                snapshot = _read_snapshot(os.path.join(self.directory, filename))
+                if snapshot is not None:
+                    _merge(counters, histograms, snapshot)
+        return counters, histograms
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        counters, histograms = self.collect()
+        series = {}
+        for key, value in sorted(counters.items()):
+            name, labels = json.loads(key)
+            series.setdefault(name, []).append(f'{name}{_labels(labels)} {value}')
+        for key, value in sorted(histograms.items()):
+            name, labels = json.loads(key)
+            lines = series.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), value['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels + [["le", str(bound)]])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {value["sum"]}')
+            lines.append(f'{name}_count{_labels(labels)} {value["count"]}')
+
+        output = []
+        for name, (kind, help_text) in METRICS.items():
+            output.append(f'# HELP {name} {help_text}')
+            output.append(f'# TYPE {name} {kind}')
+            output.extend(series.get(name, []))
+        return '\n'.join(output) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+registry = MetricsRegistry(settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL)
+atexit.register(registry.flush, force=True)
@@ -0,0 +1,226 @@
+import logging
+import math
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+
+from .compression import compressed_content, is_compressible, negotiate
+from .instrumentation import current_timings, start_request_timings, stop_request_timings
+from .metrics import registry
+from .minify import is_html, minify_response
+from .ratelimit import check_rate_limit
+
+
+logger = logging.getLogger('portfolio.performance')
+
+SERVER_TIMING_METRICS = ('view', 'template', 'db', 'cache')
+
+
+class MetricsMiddleware:
+    """Count every request, its latency and its queries per URL name for ``/metrics``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        url_name = (match.url_name if match else None) or 'unmatched'
+        registry.inc('portfolio_requests_total', {
+            'url_name': url_name, 'method': request.method, 'status': str(response.status_code),
+        })
+        registry.observe('portfolio_request_duration_seconds', elapsed, {'url_name': url_name})
+        if queries[0]:
+            registry.inc('portfolio_db_queries_total', {'url_name': url_name}, queries[0])
+        registry.flush()
+        return response
+
+
+class CompressionMiddleware:
+    """Compress responses with Brotli or gzip, whichever the client prefers.
+
+    Streaming responses and bodies under ``COMPRESSION_MIN_SIZE`` bytes are
+    sent as they are. Pages from the page cache reuse their cached
+    compressed copy (see portfolio.compression).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        response.content = compressed_content(response, encoding)
+        response['Content-Length'] = str(len(response.content))
+        response['Content-Encoding'] = encoding
+        # The bytes differ from the identity body, so a strong ETag would be wrong.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class HtmlMinifyMiddleware:
+    """Minify HTML responses and count the bytes saved per URL name for ``/metrics``.
+
+    Pages from the page cache were minified before they were stored and are
+    only counted (see portfolio.minify).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.HTML_MINIFY
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.enabled or not is_html(response):
+            return response
+
+        saved = getattr(response, 'html_bytes_saved', None)
+        if saved is None:
+            saved = minify_response(response)
+        match = request.resolver_match
+        url_name = (match.url_name if match else None) or 'unmatched'
+        registry.inc('portfolio_html_bytes_saved_total', {'url_name': url_name}, saved)
+        return response
+
+
+class RateLimitMiddleware:
+    """Refuse requests over the ``RATE_LIMITS`` configured for their URL name with a 429."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rules = settings.RATE_LIMITS if settings.RATE_LIMIT_ENABLED else {}
+        self.proxy_count = settings.RATE_LIMIT_PROXY_COUNT
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        rule = self.rules.get(match.url_name)
+        if rule is None or request.method not in rule.get('methods', ('GET', 'POST')):
+            return None
+
+        retry_after = check_rate_limit(request, match.url_name, rule, self.proxy_count)
+        if retry_after is None:
+            return None
+        message = 'Too many requests. Please try again later.'
+        if match.route.startswith('api/'):
+            response = JsonResponse({'error': message}, status=429)
+        else:
+            response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+        response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+
+class ServerTimingMiddleware:
+    """Measure where sampled requests spend their time.
+
+    Time in the view, template rendering, database queries and cache calls is
+    reported in a ``Server-Timing`` header and a JSON log line. Only a
+    ``SERVER_TIMING_SAMPLE_RATE`` fraction of requests is measured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.SERVER_TIMING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timings, token = start_request_timings()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self.time_query):
+                response = self.get_response(request)
+        finally:
+            stop_request_timings(token)
+        end = time.perf_counter()
+
+        view_started = getattr(request, '_view_started', None)
+        if 'view' not in timings.durations and view_started is not None:
+            timings.add('view', end - view_started - timings.durations.get('template', 0.0))
+        timings.add('total', end - start)
+
+        response['Server-Timing'] = self.server_timing(timings)
+        self.log(request, response, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if current_timings() is not None:
+            request._view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timings = current_timings()
+        view_started = getattr(request, '_view_started', None)
+        if timings is None or view_started is None:
+            return response
+
+        render_started = time.perf_counter()
+        timings.add('view', render_started - view_started - timings.durations.get('template', 0.0))
+        if response.is_rendered:
+            return response
+        response.add_post_render_callback(
+            lambda rendered: timings.add('template', time.perf_counter() - render_started)
+        )
+        return response
+
+    @staticmethod
+    def time_query(execute, sql, params, many, context):
+        timings = current_timings()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if timings is not None:
+                timings.add('db', time.perf_counter() - start)
+
+    @staticmethod
+    def server_timing(timings):
+        entries = ['total;dur=%.2f' % (timings.durations['total'] * 1000)]
+        for name in SERVER_TIMING_METRICS:
+            if name not in timings.durations:
+                continue
+            entry = '%s;dur=%.2f' % (name, timings.durations[name] * 1000)
+            if name in ('db', 'cache'):
+                entry += ';desc="%d calls"' % timings.counts[name]
+            entries.append(entry)
+        return ', '.join(entries)
+
+    @staticmethod
+    def log(request, response, timings):
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'url_name': match.url_name if match else None,
+            'status': response.status_code,
+        }
+        for name in ('total',) + SERVER_TIMING_METRICS:
+            record[f'{name}_ms'] = round(timings.durations.get(name, 0.0) * 1000, 3)
+        record['db_queries'] = timings.counts.get('db', 0)
+        record['cache_calls'] = timings.counts.get('cache', 0)
+        logger.info('%s %s', request.method, request.path, extra=record)
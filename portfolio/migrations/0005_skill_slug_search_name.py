@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:16
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def populate_skill_lookups(apps, schema_editor):
+    Skill = apps.get_model('portfolio', 'Skill')
+    for skill in Skill.objects.all():
+        skill.slug = skill.slug or slugify(skill.name)
+        skill.search_name = ' '.join(skill.name.split()).lower()
+        skill.save(update_fields=['slug', 'search_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0004_alter_skill_proficiency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skill',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='skill',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=100),
+        ),
+        migrations.RunPython(populate_skill_lookups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0008_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpamClassifier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spam_tokens', models.JSONField(default=dict)),
+                ('ham_tokens', models.JSONField(default=dict)),
+                ('spam_messages', models.PositiveIntegerField(default=0)),
+                ('ham_messages', models.PositiveIntegerField(default=0)),
+                ('trained_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-trained_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='is_spam',
+            field=models.BooleanField(default=False, help_text='Marked as spam; used to train the spam filter'),
+        ),
+    ]
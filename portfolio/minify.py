@@ -0,0 +1,83 @@
+"""Safe minification of rendered HTML.
+
+Only changes that cannot alter rendering are made:
+
+- runs of whitespace between and inside text become a single space, or a
+  single newline when the run contained one
+- whitespace between a tag's attributes is collapsed, and so is whitespace
+  inside ``class`` values; other attribute values are left as they are
+- comments are dropped, except conditional comments (``<!--[if``)
+
+The contents of ``<pre>``, ``<textarea>``, ``<script>`` and ``<style>`` are
+left untouched.
+"""
+import re
+
+
+_PRESERVED_RE = re.compile(r'<(pre|textarea|script|style)\b.*?</\1\s*>', re.S | re.I)
+_MARKUP_RE = re.compile(r'<!--.*?-->|<(?:[^>"\']|"[^"]*"|\'[^\']*\')*>', re.S)
+_TAG_PART_RE = re.compile(r'((?<![\w-])class=)?("[^"]*"|\'[^\']*\')|\s+', re.I)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _collapse(match):
+    return '\n' if '\n' in match.group() else ' '
+
+
+def _tag_part(match):
+    if match.group(2) is None:
+        return ' '
+    value = match.group(2)
+    if match.group(1):
+        quote = value[0]
+        value = quote + ' '.join(value[1:-1].split()) + quote
+    return (match.group(1) or '') + value
+
+
+def _minify_markup(html):
+    parts = []
+    # Text on both sides of a dropped comment is collapsed as one run.
+    text = []
+    position = 0
+    for match in _MARKUP_RE.finditer(html):
+        text.append(html[position:match.start()])
+        position = match.end()
+        markup = match.group()
+        if markup.startswith('<!--') and not markup.startswith('<!--[if'):
+            continue
+        parts.append(_WHITESPACE_RE.sub(_collapse, ''.join(text)))
+        text = []
+        parts.append(markup if markup.startswith('<!--') else _TAG_PART_RE.sub(_tag_part, markup))
+    text.append(html[position:])
+    parts.append(_WHITESPACE_RE.sub(_collapse, ''.join(text)))
+    return ''.join(parts)
+
+
+def minify_html(html):
+    parts = []
+    position = 0
+    for match in _PRESERVED_RE.finditer(html):
+        parts.append(_minify_markup(html[position:match.start()]))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(_minify_markup(html[position:]))
+    return ''.join(parts)
+
+
+def is_html(response):
+    return (
+        not response.streaming
+        and not response.has_header('Content-Encoding')
+        and response.get('Content-Type', '').split(';')[0].strip().lower() == 'text/html'
+    )
+
+
+def minify_response(response):
+    """Minify the response body in place; returns the number of bytes saved."""
+    original = response.content
+    minified = minify_html(original.decode(response.charset)).encode(response.charset)
+    response.content = minified
+    if response.has_header('Content-Length'):
+        response['Content-Length'] = str(len(minified))
+    response.html_bytes_saved = len(original) - len(minified)
+    return response.html_bytes_saved
@@ -1,10 +1,18 @@
 from django.db import models
 from django.utils import timezone
+from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
+def normalize_skill_name(name):
+    """Lowercased, whitespace-collapsed form of a skill name used for lookups."""
+    return ' '.join(name.split()).lower()
+
+
 class Skill(models.Model):
     name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, blank=True)
+    search_name = models.CharField(max_length=100, db_index=True, editable=False, default='')
     proficiency = models.DecimalField(
         max_digits=3, 
         decimal_places=1,
@@ -27,10 +35,32 @@ class Skill(models.Model):
 
     class Meta:
         ordering = ['order', 'name']
+        indexes = [
+            models.Index(
+                fields=['order', 'name'], condition=models.Q(is_active=True),
+                name='skill_active_order_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_name = instance.__dict__.get('name')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Follow a rename unless the slug was set by hand, so filter URLs keep
+        # matching the skill's name.
+        loaded_name = getattr(self, '_loaded_name', None)
+        if not self.slug or (loaded_name is not None and self.slug == slugify(loaded_name)):
+            self.slug = slugify(self.name)
+        self.search_name = normalize_skill_name(self.name)
+        super().save(*args, **kwargs)
+        self._loaded_name = self.name
+
 
 class Education(models.Model):
     institution = models.CharField(max_length=200)
@@ -45,6 +75,9 @@ class Education(models.Model):
 
     class Meta:
         ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['-start_date'], name='education_start_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.degree} - {self.institution}"
@@ -63,6 +96,12 @@ class Certification(models.Model):
 
     class Meta:
         ordering = ['-issue_date']
+        indexes = [
+            models.Index(
+                fields=['-issue_date'], condition=models.Q(is_active=True),
+                name='certification_active_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.issuer}"
@@ -73,6 +112,7 @@ class Project(models.Model):
     description = models.TextField()
     long_description = models.TextField(blank=True)
     image = models.ImageField(upload_to='projects/', blank=True, null=True)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     github_url = models.URLField(blank=True)
     live_url = models.URLField(blank=True)
     tech_stack = models.ManyToManyField(Skill, blank=True)
@@ -83,17 +123,42 @@ class Project(models.Model):
 
     class Meta:
         ordering = ['order', '-created_at']
+        indexes = [
+            models.Index(fields=['order', '-created_at'], name='project_order_idx'),
+            models.Index(
+                fields=['order', '-created_at'], condition=models.Q(featured=True),
+                name='project_featured_order_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class RelatedProject(models.Model):
+    """Precomputed ranking of projects similar to ``project`` by shared skills."""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='related_from')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['project', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'rank'], name='related_project_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.project} -> {self.related} ({self.score:.2f})"
+
+
 class BlogPost(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     content = models.TextField()
     excerpt = models.TextField(max_length=500, blank=True)
     featured_image = models.ImageField(upload_to='blog/', blank=True, null=True)
+    featured_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     author = models.CharField(max_length=100, default="Doni Alston G")
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
@@ -103,6 +168,12 @@ class BlogPost(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['-created_at'], condition=models.Q(published=True),
+                name='blogpost_published_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -120,19 +191,77 @@ class ContactMessage(models.Model):
     message = models.TextField()
     created_at = models.DateTimeField(default=timezone.now)
     is_read = models.BooleanField(default=False)
+    is_spam = models.BooleanField(default=False, help_text="Marked as spam; used to train the spam filter")
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='contactmessage_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.subject}"
 
 
+class SpamClassifier(models.Model):
+    """Token document frequencies of spam and ham contact messages (see portfolio.spam)."""
+    spam_tokens = models.JSONField(default=dict)
+    ham_tokens = models.JSONField(default=dict)
+    spam_messages = models.PositiveIntegerField(default=0)
+    ham_messages = models.PositiveIntegerField(default=0)
+    trained_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-trained_at']
+
+    def __str__(self):
+        return f"Spam classifier ({self.spam_messages} spam, {self.ham_messages} ham)"
+
+
+class OutboxEmail(models.Model):
+    """Email queued in the same transaction as its cause and delivered by the outbox worker."""
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    contact_message = models.ForeignKey(
+        ContactMessage, on_delete=models.SET_NULL, null=True, blank=True, related_name='emails'
+    )
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(
+        max_length=10,
+        choices=[
+            (PENDING, 'Pending'),
+            (SENT, 'Sent'),
+            (FAILED, 'Failed'),
+        ],
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} ({self.status})"
+
+
 class PersonalInfo(models.Model):
     name = models.CharField(max_length=100, default="Doni Alston G")
     title = models.CharField(max_length=200, default="Python Full Stack Developer")
     bio = models.TextField()
     profile_image = models.ImageField(upload_to='profile/', blank=True, null=True)
+    profile_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     resume = models.FileField(upload_to='resume/', blank=True, null=True)
     email = models.EmailField()
     phone = models.CharField(max_length=20, blank=True)
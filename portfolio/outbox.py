@@ -0,0 +1,193 @@
+"""Delivery of queued ``OutboxEmail`` rows over a reused connection, with retries."""
+import logging
+import os
+import random
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .metrics import registry
+from .models import OutboxEmail
+
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_BATCH_SIZE = 50
+# A claimed row is hidden from other workers for this long; if the worker dies
+# mid-batch the row becomes due again afterwards.
+CLAIM_LEASE = timedelta(minutes=5)
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter after ``attempts`` failed deliveries."""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim_due(limit=DELIVERY_BATCH_SIZE):
+    """Lease up to ``limit`` due emails to this worker and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        OutboxEmail.objects.filter(id__in=ids).update(next_attempt_at=now + CLAIM_LEASE)
+    return list(OutboxEmail.objects.filter(id__in=ids).order_by('created_at'))
+
+
+def _mark_sent(email):
+    email.status = OutboxEmail.SENT
+    email.attempts += 1
+    email.sent_at = timezone.now()
+    email.last_error = ''
+    email.save(update_fields=['status', 'attempts', 'sent_at', 'last_error'])
+    registry.inc('portfolio_emails_total', {'outcome': 'sent'})
+
+
+def _mark_failed(email, error):
+    email.attempts += 1
+    email.last_error = f'{type(error).__name__}: {error}'[:2000]
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = OutboxEmail.FAILED
+        outcome = 'failed'
+        logger.error('Giving up on outbox email %s after %d attempts: %s', email.pk, email.attempts, error)
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+        outcome = 'retry'
+        logger.warning('Outbox email %s failed (attempt %d), retrying: %s', email.pk, email.attempts, error)
+    email.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
+    registry.inc('portfolio_emails_total', {'outcome': outcome})
+
+
+def deliver_due(limit=DELIVERY_BATCH_SIZE):
+    """Send a batch of due emails over one connection; returns the number claimed."""
+    # Taken before claiming, so it is never later than the real lease expiry.
+    lease_ends = timezone.now() + CLAIM_LEASE
+    emails = claim_due(limit)
+    if not emails:
+        return 0
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            _mark_failed(email, error)
+        return len(emails)
+
+    try:
+        for email in emails:
+            if timezone.now() + timedelta(seconds=settings.EMAIL_TIMEOUT) >= lease_ends:
+                # A send started now might outlast the lease and be repeated by
+                # another worker; the rest become due again when it expires.
+                break
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.recipients,
+                connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as error:
+                _mark_failed(email, error)
+                # The connection may be unusable after an error; start afresh.
+                connection.close()
+                try:
+                    connection.open()
+                except Exception:
+                    pass
+            else:
+                _mark_sent(email)
+    finally:
+        connection.close()
+    return len(emails)
+
+
+def deliver_all(batch_size=DELIVERY_BATCH_SIZE):
+    """Deliver batches until nothing is due; returns the number of emails attempted."""
+    total = 0
+    while True:
+        claimed = deliver_due(batch_size)
+        total += claimed
+        if claimed < batch_size:
+            return total
+
+
+class OutboxWorker:
+    """Background thread delivering the outbox of this process.
+
+    Server processes call ``start()`` at startup, so emails left pending or
+    retrying by a restart are delivered without waiting for a new one.
+    ``wake()`` is called after a transaction queueing email commits; the
+    thread also polls every ``EMAIL_OUTBOX_POLL_INTERVAL`` seconds to pick up
+    retries and rows queued by other processes.
+    """
+
+    def __init__(self):
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self.started = False
+
+    def start(self):
+        """Start the thread and deliver whatever is already due."""
+        self.started = True
+        self.wake()
+
+    def wake(self):
+        """Signal the thread; does nothing in a process that never called ``start()``."""
+        if not self.started:
+            return
+        self._ensure_started()
+        self._wake.set()
+
+    def _after_fork(self):
+        # The thread does not survive a fork (gunicorn --preload starts
+        # workers from a master that already ran it); restart it in the child.
+        self._lock = threading.Lock()
+        if self.started:
+            self.start()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='outbox-worker', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(settings.EMAIL_OUTBOX_POLL_INTERVAL)
+            self._wake.clear()
+            try:
+                deliver_all()
+            except Exception:
+                logger.exception('Outbox delivery failed')
+            finally:
+                connections.close_all()
+
+
+worker = OutboxWorker()
+os.register_at_fork(after_in_child=worker._after_fork)
+
+
+def notify_outbox():
+    """Hand newly committed outbox rows to this process's worker, if ``ready()`` started one.
+
+    Commands and other processes that are not web servers never start it;
+    their rows wait for a server's worker or a ``send_outbox`` run.
+    """
+    worker.wake()
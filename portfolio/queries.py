@@ -0,0 +1,36 @@
+from django.db.models import Prefetch
+
+from .models import Project, Skill
+
+
+def projects_with_tech_stack(queryset=None):
+    """Return projects with their tech stack loaded in a single extra query."""
+    if queryset is None:
+        queryset = Project.objects.all()
+    return queryset.prefetch_related(
+        Prefetch('tech_stack', queryset=Skill.objects.only('id', 'name'))
+    )
+
+
+def featured_projects(limit=3):
+    """Featured projects for the home page, tech stack prefetched."""
+    return projects_with_tech_stack(Project.objects.filter(featured=True))[:limit]
+
+
+def related_projects(project):
+    """Projects most similar to ``project``, read from the precomputed ranking."""
+    queryset = Project.objects.filter(related_from__project=project).order_by('related_from__rank')
+    return projects_with_tech_stack(queryset)
+
+
+def project_payload(project):
+    """Serialize a project (with prefetched tech stack) for the JSON API."""
+    return {
+        'id': project.id,
+        'title': project.title,
+        'description': project.description,
+        'image_url': project.image.url if project.image else '',
+        'github_url': project.github_url,
+        'live_url': project.live_url,
+        'tech_stack': [skill.name for skill in project.tech_stack.all()],
+    }
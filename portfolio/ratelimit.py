@@ -0,0 +1,105 @@
+"""Token-bucket rate limiting per client IP and globally, per URL name."""
+import logging
+import math
+import threading
+import time
+
+from .cache import cache
+from .metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_KEY = 'portfolio:ratelimit:%s:%s'
+
+
+def client_ip(request, proxy_count=0):
+    """The client address, taken from X-Forwarded-For behind ``proxy_count`` trusted proxies."""
+    if proxy_count:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= proxy_count:
+            return forwarded[-proxy_count]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+class TokenBucketLimiter:
+    """Token buckets kept in the shared cache, with in-process state as a fallback.
+
+    Each bucket holds ``capacity`` tokens and refills over ``period``
+    seconds. It is stored as its theoretical arrival time (GCRA), a single
+    timestamp: the bucket is full when it is in the past and empty when it
+    is ``period`` seconds ahead. A request is admitted only if every bucket
+    it draws from has a token, and then takes one from each.
+
+    Updates are a read followed by a write, so requests racing in other
+    processes may occasionally both take the last token.
+    """
+
+    def __init__(self):
+        self._local = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, buckets, now=None):
+        """Take a token from each bucket in ``{scope: (key, capacity, period)}``.
+
+        Returns ``(None, 0)`` when admitted, otherwise the scope of the
+        limiting bucket and the seconds until it has a token again.
+        """
+        now = time.time() if now is None else now
+        keys = [key for key, capacity, period in buckets.values()]
+        try:
+            stored = cache.get_many(keys)
+        except Exception:
+            logger.warning('Rate limit cache unavailable; using in-process buckets', exc_info=True)
+            registry.inc('portfolio_ratelimit_fallbacks_total')
+            with self._lock:
+                return self._take(buckets, self._local, now, self._store_local)
+        return self._take(buckets, stored, now, self._store_shared)
+
+    def _take(self, buckets, stored, now, store):
+        updates = {}
+        limited_scope, retry_after = None, 0.0
+        for scope, (key, capacity, period) in buckets.items():
+            arrival = max(stored.get(key, now), now) + period / capacity
+            wait = arrival - now - period
+            if wait > retry_after:
+                limited_scope, retry_after = scope, wait
+            updates[key] = (arrival, period)
+        if limited_scope is None:
+            store(updates)
+        return limited_scope, retry_after
+
+    def _store_local(self, updates):
+        for key, (arrival, period) in updates.items():
+            self._local[key] = arrival
+        if len(self._local) > 10000:
+            now = time.time()
+            self._local = {key: arrival for key, arrival in self._local.items() if arrival > now}
+
+    def _store_shared(self, updates):
+        try:
+            for key, (arrival, period) in updates.items():
+                cache.set(key, arrival, math.ceil(period) + 1)
+        except Exception:
+            logger.warning('Could not store rate limit state', exc_info=True)
+            with self._lock:
+                self._store_local(updates)
+
+
+limiter = TokenBucketLimiter()
+
+
+def check_rate_limit(request, url_name, rule, proxy_count=0):
+    """Apply ``rule`` to the request; returns seconds to wait when it must be refused, else None."""
+    buckets = {}
+    if 'per_ip' in rule:
+        capacity, period = rule['per_ip']
+        buckets['per_ip'] = (RATE_LIMIT_KEY % (url_name, client_ip(request, proxy_count)), capacity, period)
+    if 'global' in rule:
+        capacity, period = rule['global']
+        buckets['global'] = (RATE_LIMIT_KEY % (url_name, 'global'), capacity, period)
+
+    scope, retry_after = limiter.acquire(buckets)
+    result = 'allowed' if scope is None else f'limited_{scope}'
+    registry.inc('portfolio_ratelimit_requests_total', {'url_name': url_name, 'result': result})
+    return None if scope is None else retry_after
@@ -0,0 +1,192 @@
+import heapq
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections, transaction
+from django.db.models import Count, Min
+
+from .cache import bump_content_version
+from .models import Project, RelatedProject
+
+
+logger = logging.getLogger(__name__)
+
+
+RELATED_PROJECTS_LIMIT = 3
+REBUILD_BATCH_SIZE = 1000
+
+
+def _tech_stack_rows(**filters):
+    return Project.tech_stack.through.objects.filter(**filters).values_list(
+        'project_id', 'skill_id'
+    ).iterator()
+
+
+def _skill_sets(project_ids):
+    skill_sets = defaultdict(set)
+    for project_id, skill_id in _tech_stack_rows(project_id__in=project_ids):
+        skill_sets[project_id].add(skill_id)
+    return skill_sets
+
+
+def _similarity_scores(project_id, skill_sets, projects_by_skill):
+    """Jaccard similarity of ``project_id`` to every project sharing a skill with it."""
+    skills = skill_sets.get(project_id, set())
+    overlap = Counter()
+    for skill_id in skills:
+        overlap.update(projects_by_skill[skill_id])
+    overlap.pop(project_id, None)
+    return {
+        other_id: shared / (len(skills) + len(skill_sets[other_id]) - shared)
+        for other_id, shared in overlap.items()
+    }
+
+
+def _top_related(project_id, skill_sets, projects_by_skill, limit=RELATED_PROJECTS_LIMIT):
+    """Return the ``limit`` best ``(related_id, score)`` pairs for ``project_id``.
+
+    Skills are visited rarest first. A project not seen yet can only share
+    the skills left to visit, so its score is at most ``remaining / |skills|``;
+    once that bound drops below the current last place the long posting lists
+    of popular skills are skipped. Ties are broken by the lower project id.
+    """
+    skills = skill_sets.get(project_id)
+    if not skills:
+        return []
+    ordered = sorted(skills, key=lambda skill_id: (len(projects_by_skill[skill_id]), skill_id))
+    best = []  # min-heap of (score, -related_id)
+    seen = {project_id}
+    for index, skill_id in enumerate(ordered):
+        if len(best) == limit and (len(ordered) - index) / len(skills) < best[0][0]:
+            break
+        for other_id in projects_by_skill[skill_id]:
+            if other_id in seen:
+                continue
+            seen.add(other_id)
+            other_skills = skill_sets[other_id]
+            shared = len(skills & other_skills)
+            item = (shared / (len(skills) + len(other_skills) - shared), -other_id)
+            if len(best) < limit:
+                heapq.heappush(best, item)
+            elif item > best[0]:
+                heapq.heapreplace(best, item)
+    return [(-negative_id, score) for score, negative_id in sorted(best, reverse=True)]
+
+
+def _load_neighbourhood(project_ids):
+    """Skill sets of ``project_ids`` and of every project sharing a skill with them."""
+    skill_sets = _skill_sets(project_ids)
+    skill_ids = set().union(*skill_sets.values())
+    projects_by_skill = defaultdict(set)
+    for project_id, skill_id in _tech_stack_rows(skill_id__in=skill_ids):
+        projects_by_skill[skill_id].add(project_id)
+    neighbours = set().union(*projects_by_skill.values()) - set(skill_sets)
+    skill_sets.update(_skill_sets(neighbours))
+    return skill_sets, projects_by_skill
+
+
+def _store_related(project_ids, skill_sets, projects_by_skill):
+    rows = [
+        RelatedProject(project_id=project_id, related_id=related_id, score=score, rank=rank)
+        for project_id in project_ids
+        for rank, (related_id, score) in enumerate(
+            _top_related(project_id, skill_sets, projects_by_skill)
+        )
+    ]
+    with transaction.atomic():
+        RelatedProject.objects.filter(project_id__in=project_ids).delete()
+        RelatedProject.objects.bulk_create(rows)
+
+
+def recompute_related(project_ids):
+    """Recompute and store the ranked related projects of ``project_ids``."""
+    project_ids = set(project_ids)
+    if project_ids:
+        _store_related(project_ids, *_load_neighbourhood(project_ids))
+
+
+def refresh_related(project_ids):
+    """Update stored rankings after the tech stacks of ``project_ids`` changed.
+
+    Besides the projects themselves, only the projects that listed one of
+    them, and the projects whose current top results one of them now beats,
+    are recomputed, all in one pass.
+    """
+    project_ids = set(project_ids)
+    if not project_ids:
+        return
+    affected = set(project_ids)
+    affected.update(
+        RelatedProject.objects.filter(related_id__in=project_ids).values_list('project_id', flat=True)
+    )
+
+    skill_sets, projects_by_skill = _load_neighbourhood(project_ids)
+    scores = {}
+    for project_id in project_ids:
+        for other_id, score in _similarity_scores(project_id, skill_sets, projects_by_skill).items():
+            scores[other_id] = max(score, scores.get(other_id, 0.0))
+    current = {
+        row['project_id']: row
+        for row in RelatedProject.objects.filter(project_id__in=scores).values(
+            'project_id'
+        ).annotate(entries=Count('id'), lowest=Min('score')).order_by()
+    }
+    for other_id, score in scores.items():
+        row = current.get(other_id)
+        if row is None or row['entries'] < RELATED_PROJECTS_LIMIT or score >= row['lowest']:
+            affected.add(other_id)
+
+    recompute_related(affected)
+
+
+_executor = {'pid': None, 'pool': None}
+_executor_lock = threading.Lock()
+
+
+def _run_in_background(recompute, project_ids):
+    try:
+        recompute(project_ids)
+        # Pages rendered while the rankings were rewritten may show the old ones.
+        bump_content_version(Project)
+    except Exception:
+        logger.exception('Could not update related projects of %d projects', len(project_ids))
+    finally:
+        connections.close_all()
+
+
+def schedule_refresh(project_ids, recompute=refresh_related):
+    """Update the rankings of ``project_ids`` on this process's background thread once the save commits.
+
+    ``recompute`` is ``refresh_related`` when their tech stacks changed, or
+    ``recompute_related`` when only their own rankings need redoing.
+    """
+    project_ids = set(project_ids)
+    if not project_ids:
+        return
+
+    def submit():
+        with _executor_lock:
+            # Threads do not survive a fork, so each process starts its own pool.
+            if _executor['pid'] != os.getpid():
+                _executor['pool'] = ThreadPoolExecutor(max_workers=1, thread_name_prefix='related-projects')
+                _executor['pid'] = os.getpid()
+            _executor['pool'].submit(_run_in_background, recompute, project_ids)
+
+    transaction.on_commit(submit)
+
+
+def rebuild_related(batch_size=REBUILD_BATCH_SIZE):
+    """Recompute the rankings of every project, storing ``batch_size`` at a time."""
+    skill_sets = defaultdict(set)
+    projects_by_skill = defaultdict(set)
+    for project_id, skill_id in _tech_stack_rows():
+        skill_sets[project_id].add(skill_id)
+        projects_by_skill[skill_id].add(project_id)
+
+    project_ids = list(Project.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(project_ids), batch_size):
+        _store_related(project_ids[start:start + batch_size], skill_sets, projects_by_skill)
+    return len(project_ids)
@@ -0,0 +1,45 @@
+"""The release id mixed into page cache keys and ETags.
+
+Read by the settings module, so it must not import anything from Django.
+"""
+import hashlib
+from pathlib import Path
+
+
+STATIC_MANIFEST = 'staticfiles.json'
+
+
+def git_head(base_dir):
+    """The commit checked out in ``base_dir``, or '' outside a git checkout."""
+    git = Path(base_dir) / '.git'
+    try:
+        head = (git / 'HEAD').read_text().strip()
+        if not head.startswith('ref: '):
+            return head
+        ref = head[len('ref: '):]
+        if (git / ref).is_file():
+            return (git / ref).read_text().strip()
+        for line in (git / 'packed-refs').read_text().splitlines():
+            if line.endswith(' ' + ref):
+                return line.split()[0]
+    except OSError:
+        pass
+    return ''
+
+
+def detect_release(base_dir, static_root, template_dirs):
+    """Digest of the checked-out commit, the collected static manifest and the templates.
+
+    A deploy that changes the pages changes at least one of them, whether or
+    not the host tells the app which commit it runs.
+    """
+    digest = hashlib.sha256(git_head(base_dir).encode())
+    manifest = Path(static_root) / STATIC_MANIFEST
+    if manifest.is_file():
+        digest.update(manifest.read_bytes())
+    for directory in map(Path, template_dirs):
+        for path in sorted(directory.rglob('*')):
+            if path.is_file():
+                digest.update(str(path.relative_to(directory)).encode())
+                digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
@@ -0,0 +1,93 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_content_version, invalidate_personal_info
+from .images import needs_renditions, schedule_renditions
+from .models import BlogPost, Certification, Education, PersonalInfo, Project, RelatedProject, Skill
+from .related import recompute_related, schedule_refresh
+
+
+CONTENT_MODELS = (Project, Skill, Education, Certification, PersonalInfo)
+
+
+@receiver([post_save, post_delete], sender=PersonalInfo)
+def personal_info_changed(sender, **kwargs):
+    """Invalidate the cached PersonalInfo once a save or delete of the row commits.
+
+    Invalidating earlier would let a concurrent request cache the old row again.
+    """
+    transaction.on_commit(invalidate_personal_info)
+
+
+def content_changed(sender, **kwargs):
+    """Invalidate cached pages that depend on the changed model once the change commits.
+
+    Bumping earlier would let a request that still reads the old rows cache
+    them under the new version.
+    """
+    transaction.on_commit(partial(bump_content_version, sender))
+
+
+for model in CONTENT_MODELS:
+    post_save.connect(content_changed, sender=model, dispatch_uid='content_changed_%s' % model._meta.label_lower)
+    post_delete.connect(content_changed, sender=model, dispatch_uid='content_deleted_%s' % model._meta.label_lower)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=PersonalInfo)
+def image_saved(sender, instance, raw=False, **kwargs):
+    """Encode derivatives of newly uploaded images in the background."""
+    if not raw and needs_renditions(instance):
+        schedule_renditions(instance)
+
+
+@receiver(m2m_changed, sender=Project.tech_stack.through)
+def project_tech_stack_changed(sender, action, **kwargs):
+    """Invalidate project pages once a change to a project's tech stack commits."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(partial(bump_content_version, Project))
+
+
+@receiver(m2m_changed, sender=Project.tech_stack.through)
+def refresh_related_projects(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep the precomputed related-project rankings in step with tech stacks."""
+    if reverse and action == 'pre_clear':
+        instance._related_refresh_ids = list(instance.project_set.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        project_ids = [instance.pk]
+    elif action == 'post_clear':
+        project_ids = getattr(instance, '_related_refresh_ids', [])
+    else:
+        project_ids = pk_set
+    schedule_refresh(project_ids)
+
+
+@receiver(pre_delete, sender=Project)
+def remember_projects_listing(sender, instance, **kwargs):
+    instance._related_refresh_ids = list(
+        RelatedProject.objects.filter(related=instance).values_list('project_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Project)
+def refill_projects_listing(sender, instance, **kwargs):
+    """Projects that listed a deleted project get a new ranking."""
+    schedule_refresh(getattr(instance, '_related_refresh_ids', []), recompute_related)
+
+
+@receiver(pre_delete, sender=Skill)
+def remember_projects_using(sender, instance, **kwargs):
+    instance._related_refresh_ids = list(instance.project_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Skill)
+def refresh_projects_using(sender, instance, **kwargs):
+    """Deleting a skill changes the tech stack of every project that used it."""
+    schedule_refresh(getattr(instance, '_related_refresh_ids', []))
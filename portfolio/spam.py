@@ -0,0 +1,196 @@
+"""Layered spam screen run on contact submissions before anything is stored or sent.
+
+The layers run cheapest first and the first one that objects decides:
+
+1. honeypot: a field hidden from people that bots fill in
+2. fill time: a signed token issued with the form, rejected when the form
+   comes back faster than ``SPAM_MIN_FILL_SECONDS`` or is missing or forged
+3. duplicates: the same normalised content seen within ``SPAM_DUPLICATE_WINDOW``
+4. classifier: naive Bayes over message tokens, trained from messages marked
+   as spam in the admin
+"""
+import hashlib
+import math
+import re
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+
+from .cache import cache
+from .models import ContactMessage, SpamClassifier
+
+
+FORM_TOKEN_SALT = 'portfolio.contact.form-token'
+FORM_TOKEN_MAX_AGE = 24 * 60 * 60
+DUPLICATE_KEY = 'portfolio:spam:duplicate:%s'
+MAX_VOCABULARY = 5000
+# The classifier only votes once it has seen this many messages of each kind.
+MIN_TRAINING_MESSAGES = 5
+CLASSIFIER_LOCAL_TTL = 60
+
+_TOKEN_RE = re.compile(r'[a-z0-9][a-z0-9\'.-]{1,23}')
+
+
+def issue_form_token(issued_at=None):
+    """Signed timestamp rendered into the contact form."""
+    return signing.dumps(time.time() if issued_at is None else issued_at, salt=FORM_TOKEN_SALT)
+
+
+def honeypot_filled(data):
+    return bool(data.get('website'))
+
+
+def fill_time_problem(token, now=None):
+    """Why the form token is unacceptable (``'token'`` or ``'too_fast'``), or None."""
+    now = time.time() if now is None else now
+    try:
+        issued_at = float(signing.loads(token or '', salt=FORM_TOKEN_SALT, max_age=FORM_TOKEN_MAX_AGE))
+    except (signing.BadSignature, TypeError, ValueError):
+        return 'token'
+    if now - issued_at < settings.SPAM_MIN_FILL_SECONDS:
+        return 'too_fast'
+    return None
+
+
+def content_hash(data):
+    text = ' '.join(f"{data.get('subject', '')} {data.get('message', '')}".split()).lower()
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def seen_recently(data, now=None):
+    """Record the submission's content and report whether it was already seen too often.
+
+    The sliding window is the list of times the same content was submitted
+    during the last ``SPAM_DUPLICATE_WINDOW`` seconds, kept in the shared cache.
+    """
+    now = time.time() if now is None else now
+    window = settings.SPAM_DUPLICATE_WINDOW
+    key = DUPLICATE_KEY % content_hash(data)
+    seen = [at for at in cache.get(key, []) if at > now - window]
+    duplicate = len(seen) >= settings.SPAM_DUPLICATE_LIMIT
+    seen.append(now)
+    cache.set(key, seen, window)
+    return duplicate
+
+
+def tokenize(text):
+    return set(_TOKEN_RE.findall(text.lower()))
+
+
+def message_text(subject, message):
+    return f'{subject} {message}'
+
+
+class NaiveBayes:
+    """Naive Bayes over the distinct tokens of a message (binarized multinomial)."""
+
+    def __init__(self, spam_tokens, ham_tokens, spam_messages, ham_messages):
+        self.spam_tokens = spam_tokens
+        self.ham_tokens = ham_tokens
+        self.spam_messages = spam_messages
+        self.ham_messages = ham_messages
+        vocabulary = len(set(spam_tokens) | set(ham_tokens)) or 1
+        spam_total = sum(spam_tokens.values()) + vocabulary
+        ham_total = sum(ham_tokens.values()) + vocabulary
+        # Per-token log-likelihood ratio of spam over ham, Laplace smoothed.
+        self.weights = {
+            token: math.log((spam_tokens.get(token, 0) + 1) / spam_total)
+            - math.log((ham_tokens.get(token, 0) + 1) / ham_total)
+            for token in set(spam_tokens) | set(ham_tokens)
+        }
+        self.prior = math.log(spam_messages or 1) - math.log(ham_messages or 1)
+
+    @classmethod
+    def train(cls, spam_texts, ham_texts):
+        spam_tokens, spam_messages = cls._count(spam_texts)
+        ham_tokens, ham_messages = cls._count(ham_texts)
+        vocabulary = sorted(
+            set(spam_tokens) | set(ham_tokens),
+            key=lambda token: spam_tokens.get(token, 0) + ham_tokens.get(token, 0),
+            reverse=True,
+        )[:MAX_VOCABULARY]
+        return cls(
+            {token: spam_tokens[token] for token in vocabulary if token in spam_tokens},
+            {token: ham_tokens[token] for token in vocabulary if token in ham_tokens},
+            spam_messages,
+            ham_messages,
+        )
+
+    @staticmethod
+    def _count(texts):
+        counts, messages = {}, 0
+        for text in texts:
+            messages += 1
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+        return counts, messages
+
+    @property
+    def ready(self):
+        return min(self.spam_messages, self.ham_messages) >= MIN_TRAINING_MESSAGES
+
+    def spam_probability(self, text):
+        weights = self.weights
+        score = self.prior + sum(weights.get(token, 0.0) for token in tokenize(text))
+        if score >= 0:
+            return 1 / (1 + math.exp(-score))
+        return math.exp(score) / (1 + math.exp(score))
+
+
+def train_classifier(ham_limit=None):
+    """Retrain from messages marked as spam and the most recent other messages."""
+    ham_limit = ham_limit or settings.SPAM_TRAINING_HAM_LIMIT
+    spam = ContactMessage.objects.filter(is_spam=True).values_list('subject', 'message')
+    ham = (
+        ContactMessage.objects.filter(is_spam=False)
+        .order_by('-created_at')
+        .values_list('subject', 'message')[:ham_limit]
+    )
+    model = NaiveBayes.train(
+        (message_text(*row) for row in spam.iterator()),
+        (message_text(*row) for row in ham.iterator()),
+    )
+    with transaction.atomic():
+        SpamClassifier.objects.all().delete()
+        SpamClassifier.objects.create(
+            spam_tokens=model.spam_tokens,
+            ham_tokens=model.ham_tokens,
+            spam_messages=model.spam_messages,
+            ham_messages=model.ham_messages,
+        )
+    _classifier['expires'] = 0.0
+    return model
+
+
+_classifier = {'value': None, 'expires': 0.0}
+
+
+def get_classifier():
+    """The trained classifier, reloaded from the database at most every minute per process."""
+    now = time.monotonic()
+    if now >= _classifier['expires']:
+        stored = SpamClassifier.objects.first()
+        _classifier['value'] = stored and NaiveBayes(
+            stored.spam_tokens, stored.ham_tokens, stored.spam_messages, stored.ham_messages,
+        )
+        _classifier['expires'] = now + CLASSIFIER_LOCAL_TTL
+    return _classifier['value']
+
+
+def screen(data, now=None, classifier=None):
+    """Return the reason the submission looks like spam, or None to accept it."""
+    if honeypot_filled(data):
+        return 'honeypot'
+    problem = fill_time_problem(data.get('form_token'), now)
+    if problem:
+        return problem
+    if seen_recently(data, now):
+        return 'duplicate'
+    classifier = classifier or get_classifier()
+    if classifier is not None and classifier.ready:
+        text = message_text(data.get('subject', ''), data.get('message', ''))
+        if classifier.spam_probability(text) >= settings.SPAM_THRESHOLD:
+            return 'classifier'
+    return None
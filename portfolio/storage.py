@@ -0,0 +1,79 @@
+"""Media storage that names uploaded files after their content.
+
+An upload to ``profile/photo.jpg`` is stored as ``profile/<digest>.jpg``,
+where the digest is taken from the SHA-256 of its bytes. Uploading the same
+bytes again returns the existing name without writing anything, and a name
+never changes meaning, so media URLs can be cached forever.
+
+Files may be shared by several rows, so nothing deletes them when a row
+changes; ``manage.py gc_media`` removes the ones no row references.
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.crypto import get_random_string
+
+from .images import DERIVED_PREFIX
+
+
+DIGEST_LENGTH = 32
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_ADDRESSED_RE = re.compile(r'^[0-9a-f]{%d}$' % DIGEST_LENGTH)
+
+
+def content_digest(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()[:DIGEST_LENGTH]
+
+
+def is_addressed(name):
+    stem, _ = posixpath.splitext(posixpath.basename(name))
+    return bool(_ADDRESSED_RE.match(stem))
+
+
+def is_immutable(name):
+    """Whether the file's bytes can never change under this name.
+
+    Image derivatives qualify too: their names carry a digest of the source.
+    """
+    return is_addressed(name) or name.startswith(f'{DERIVED_PREFIX}/')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """``FileSystemStorage`` that stores uploads under a digest of their content."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = str(name).replace('\\', '/')
+        if not name.startswith(f'{DERIVED_PREFIX}/'):
+            directory, filename = posixpath.split(name)
+            extension = posixpath.splitext(filename)[1].lower()
+            name = posixpath.join(directory, content_digest(content) + extension)
+            if self.exists(name):
+                return name
+        return super().save(name, content, max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # The same name means the same bytes, so there is no need to pick another.
+        if is_immutable(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if not is_immutable(name):
+            return super()._save(name, content)
+        # Write beside the target and rename over it, so a concurrent save of
+        # the same bytes never exposes a half-written file.
+        temporary = super()._save(f'{name}.{get_random_string(8)}.tmp', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
@@ -1,4 +1,14 @@
 from django import template
+from django.conf import settings
+from django.forms.utils import flatatt
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from portfolio.assets import STYLESHEET
+from portfolio.critical import critical_css
+from portfolio.images import FORMATS
 
 register = template.Library()
 
@@ -17,3 +27,100 @@ def to_percentage(value, max_value=10):
         return (float(value) / float(max_value)) * 100
     except (ValueError, TypeError, ZeroDivisionError):
         return 0
+
+@register.simple_tag
+def responsive_image(instance, field_name, sizes='100vw', alt='', css_class='', loading='lazy'):
+    """Render an image field as <picture> with AVIF/WebP sources and a srcset of its derivatives.
+
+    The intrinsic width/height reserve the layout box, and a blurred inline
+    preview over the dominant colour fills it until the image arrives.
+
+    Usage: {% responsive_image project 'image' sizes='(min-width: 1024px) 33vw, 100vw' alt=project.title %}
+    """
+    fieldfile = getattr(instance, field_name)
+    if not fieldfile:
+        return ''
+    renditions = getattr(instance, f'{field_name}_renditions', None) or {}
+    if renditions.get('source') != fieldfile.name:
+        renditions = {}
+
+    candidates = {}
+    for variant in renditions.get('variants', ()):
+        fmt = variant.get('format', 'jpeg')
+        candidates.setdefault(fmt, []).append((fieldfile.storage.url(variant['name']), variant['width']))
+    fallback = candidates.pop('jpeg', []) + candidates.pop('png', [])
+    if renditions.get('width'):
+        fallback.append((fieldfile.url, renditions['width']))
+
+    # Browsers without srcset support get a mid-sized copy rather than the original.
+    src = next((url for url, width in fallback if width >= 960), fieldfile.url)
+    attrs = {'src': src, 'alt': alt, 'loading': loading, 'decoding': 'async'}
+    if len(fallback) > 1:
+        attrs['srcset'] = _srcset(fallback)
+        attrs['sizes'] = sizes
+    if renditions.get('width') and renditions.get('height'):
+        attrs['width'] = renditions['width']
+        attrs['height'] = renditions['height']
+    if css_class:
+        attrs['class'] = css_class
+    if renditions.get('placeholder'):
+        # Paint the dominant colour and the inline blurred preview until the
+        # image itself has loaded; no extra request is needed for either.
+        attrs['style'] = (
+            f"background: {renditions['color']} url({renditions['placeholder']}) center / cover no-repeat"
+        )
+        attrs['onload'] = "this.style.background='none'"
+    img = format_html('<img{}>', flatatt(attrs))
+
+    sources = [
+        {'type': FORMATS[fmt][1], 'srcset': _srcset(candidates[fmt]), 'sizes': sizes}
+        for fmt in settings.IMAGE_MODERN_FORMATS if fmt in candidates
+    ]
+    if not sources:
+        return img
+    # display: contents keeps the <img> sized by the surrounding layout.
+    return format_html(
+        '<picture style="display: contents">{}{}</picture>',
+        format_html_join('', '<source{}>', ((flatatt(source),) for source in sources)),
+        img,
+    )
+
+def _srcset(candidates):
+    return ', '.join(f'{url} {width}w' for url, width in sorted(candidates, key=lambda candidate: candidate[1]))
+
+@register.simple_tag(takes_context=True)
+def stylesheet(context):
+    """Link the site stylesheet, inlining the page template's critical CSS when it has been built.
+
+    With critical CSS the full stylesheet is fetched without blocking
+    rendering and applied once it arrives.
+
+    Usage: {% stylesheet %}
+    """
+    href = static(STYLESHEET)
+    template = getattr(context, 'template', None)
+    css = critical_css(template.name) if template is not None else None
+    if not css:
+        return format_html('<link rel="stylesheet" href="{}">', href)
+    return format_html(
+        '<style>{}</style>\n'
+        '<link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+        '<noscript><link rel="stylesheet" href="{}"></noscript>',
+        mark_safe(css), href, href,
+    )
+
+@register.simple_tag(takes_context=True)
+def page_url(context, number):
+    """Link to a page of the current paginated list.
+
+    Always the page's path URL (``/projects/page/2/``), so a static export
+    can serve every page; the page in the path wins over a ``?page=`` query,
+    so relative query-only links would stay on the current page. Filtered
+    lists keep the filter query.
+
+    Usage: <a href="{% page_url page_obj.next_page_number %}">
+    """
+    url_name = context['request'].resolver_match.url_name
+    url = reverse(url_name, kwargs={'page': number}) if number > 1 else reverse(url_name)
+    filter_query = context.get('filter_query')
+    return f'{url}?{filter_query}' if filter_query else url
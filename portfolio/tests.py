@@ -0,0 +1,869 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from smtplib import SMTPException
+from unittest import mock
+
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.http import HttpResponse, JsonResponse, QueryDict
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import outbox, spam
+from .cache import (
+    SharedLock, content_versions, get_personal_info, invalidate_personal_info, single_flight, single_flight_stats,
+)
+from .filters import (
+    MATCH_ALL, MATCH_ANY, filter_projects_by_tech, parse_tech_terms, prefix_upper_bound, resolve_tech_term,
+)
+from .metrics import _key, registry
+from .log import AsyncLogHandler, JsonFormatter
+from .minify import is_html, minify_html, minify_response
+from .models import (
+    Certification, ContactMessage, Education, OutboxEmail, PersonalInfo, Project, RelatedProject, Skill,
+)
+from .ratelimit import TokenBucketLimiter, check_rate_limit
+from .related import _load_neighbourhood, _similarity_scores, _top_related, rebuild_related
+from .release import detect_release
+
+
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'portfolio-tests'}}
+# The test runner sets DEBUG=False; render without a collectstatic manifest.
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES, STORAGES=TEST_STORAGES, ALLOWED_HOSTS=['testserver'], EMAIL_OUTBOX_THREAD=False)
+class QueryBudgetTests(TestCase):
+    """Every public page runs a fixed number of queries, however many rows it lists."""
+
+    @classmethod
+    def setUpTestData(cls):
+        PersonalInfo.objects.create(name='Test', bio='Bio', email='test@example.com')
+        skills = [Skill.objects.create(name=f'Skill {number}', proficiency=80, order=number) for number in range(6)]
+        for number in range(9):
+            project = Project.objects.create(
+                title=f'Project {number}', description='Description', featured=number < 4, order=number,
+            )
+            project.tech_stack.set(skills[number % 3:number % 3 + 3])
+        for number in range(3):
+            Education.objects.create(institution=f'School {number}', degree='Degree', start_date=date(2020, 1, number + 1))
+            Certification.objects.create(title=f'Cert {number}', issuer='Issuer', issue_date=date(2021, 1, number + 1))
+        rebuild_related()
+        cls.project = Project.objects.order_by('pk').first()
+
+    def setUp(self):
+        cache.clear()
+        invalidate_personal_info()
+
+    def assertQueries(self, url, cold, warm=0):
+        with self.assertNumQueries(cold):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(warm):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_home(self):
+        # PersonalInfo, featured projects, their tech stacks.
+        self.assertQueries(reverse('home'), cold=3)
+
+    def test_about(self):
+        # PersonalInfo, skills, education, certifications.
+        self.assertQueries(reverse('about'), cold=4)
+
+    def test_projects(self):
+        # PersonalInfo, count, one page of projects, their tech stacks, skill list.
+        self.assertQueries(reverse('projects'), cold=5)
+
+    def test_projects_second_page(self):
+        self.assertQueries(reverse('projects', kwargs={'page': 2}), cold=5)
+
+    def test_projects_filtered(self):
+        # The filter terms are resolved to skill ids first.
+        self.assertQueries(reverse('projects') + '?tech=skill', cold=6)
+
+    def test_project_detail(self):
+        # PersonalInfo, the project, its tech stack, related projects, their tech stacks.
+        self.assertQueries(reverse('project_detail', kwargs={'pk': self.project.pk}), cold=5)
+
+    def test_project_filter(self):
+        # Skill ids, matching projects, their tech stacks.
+        self.assertQueries(reverse('project_filter') + '?tech=skill 1', cold=3)
+
+    def test_contact(self):
+        # Not page cached; once PersonalInfo is cached the form renders without queries.
+        self.assertQueries(reverse('contact'), cold=1)
+
+
+@override_settings(CACHES=TEST_CACHES, STORAGES=TEST_STORAGES, ALLOWED_HOSTS=['testserver'])
+@mock.patch('portfolio.signals.schedule_refresh')
+class PageCacheInvalidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.info = PersonalInfo.objects.create(name='Before', bio='Bio', email='test@example.com')
+        cls.skill = Skill.objects.create(name='Python', proficiency=90)
+        cls.other_skill = Skill.objects.create(name='Go', proficiency=50)
+        cls.project = Project.objects.create(title='Project', description='d')
+        cls.project.tech_stack.set([cls.skill])
+        cls.education = Education.objects.create(institution='School', degree='Degree', start_date=date(2020, 1, 1))
+
+    def setUp(self):
+        cache.clear()
+        invalidate_personal_info()
+
+    def version(self, model):
+        return content_versions([model])[model._meta.label_lower]
+
+    def assertBumps(self, model, change):
+        before = self.version(model)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+            # Not before the change commits, or a request reading the old rows
+            # could cache them under the new version.
+            self.assertEqual(self.version(model), before)
+        self.assertNotEqual(self.version(model), before)
+
+    def test_save_bumps_version(self, schedule_refresh):
+        self.assertBumps(Project, lambda: self.project.save())
+        self.assertBumps(Skill, lambda: self.skill.save())
+        self.assertBumps(PersonalInfo, lambda: self.info.save())
+        self.assertBumps(Education, lambda: self.education.save())
+
+    def test_delete_bumps_version(self, schedule_refresh):
+        self.assertBumps(Project, lambda: self.project.delete())
+        self.assertBumps(Skill, lambda: self.other_skill.delete())
+        self.assertBumps(Education, lambda: self.education.delete())
+
+    def test_tech_stack_change_bumps_project_version(self, schedule_refresh):
+        self.assertBumps(Project, lambda: self.project.tech_stack.add(self.other_skill))
+        self.assertBumps(Project, lambda: self.project.tech_stack.remove(self.other_skill))
+        self.assertBumps(Project, lambda: self.project.tech_stack.clear())
+        self.assertBumps(Project, lambda: self.skill.project_set.add(self.project))
+
+    def test_change_re_renders_dependent_page(self, schedule_refresh):
+        url = reverse('project_detail', kwargs={'pk': self.project.pk})
+        self.assertContains(self.client.get(url), 'Project')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.title = 'Renamed'
+            self.project.save()
+        self.assertContains(self.client.get(url), 'Renamed')
+
+    def test_unrelated_change_keeps_cached_page(self, schedule_refresh):
+        url = reverse('home')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.education.save()
+        # Home does not list education: still served from the page cache.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_personal_info_cache_follows_commit(self, schedule_refresh):
+        self.assertEqual(get_personal_info().name, 'Before')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.info.name = 'After'
+            self.info.save()
+            self.assertEqual(get_personal_info().name, 'Before')
+        self.assertEqual(get_personal_info().name, 'After')
+        self.assertContains(self.client.get(reverse('about')), 'After')
+
+
+@override_settings(CACHES=TEST_CACHES, STORAGES=TEST_STORAGES, ALLOWED_HOSTS=['testserver'])
+class ReleaseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_new_release_invalidates_etag(self):
+        with override_settings(RELEASE='one'):
+            etag = self.client.get(reverse('about'))['ETag']
+            self.assertEqual(self.client.get(reverse('about'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with override_settings(RELEASE='two'):
+            response = self.client.get(reverse('about'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detected_release_follows_commit_manifest_and_templates(self):
+        with tempfile.TemporaryDirectory() as directory:
+            base = Path(directory)
+            (base / '.git' / 'refs' / 'heads').mkdir(parents=True)
+            (base / '.git' / 'HEAD').write_text('ref: refs/heads/main\n')
+            (base / '.git' / 'refs' / 'heads' / 'main').write_text('a' * 40)
+            (base / 'static').mkdir()
+            (base / 'templates').mkdir()
+            (base / 'templates' / 'page.html').write_text('<p>one</p>')
+
+            def release():
+                return detect_release(base, base / 'static', [base / 'templates'])
+
+            seen = {release()}
+            (base / '.git' / 'refs' / 'heads' / 'main').write_text('b' * 40)
+            seen.add(release())
+            (base / 'static' / 'staticfiles.json').write_text('{"paths": {"site.css": "site.1.css"}}')
+            seen.add(release())
+            (base / 'templates' / 'page.html').write_text('<p>two</p>')
+            seen.add(release())
+            self.assertEqual(len(seen), 4)
+            self.assertEqual(release(), release())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.computed = []
+        self.entered = threading.Event()
+        self.proceed = threading.Event()
+
+    def compute(self, value='fresh', block=False):
+        def compute():
+            self.computed.append(value)
+            if block:
+                self.entered.set()
+                self.proceed.wait(5)
+            return value
+        return compute
+
+    def in_thread(self, *args):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(single_flight(*args)))
+        thread.start()
+        return thread, results
+
+    def assertCounted(self, before, outcome):
+        after = single_flight_stats()
+        self.assertEqual({key: after[key] - before[key] for key in after if after[key] != before[key]}, {outcome: 1})
+
+    def test_leader_computes_and_stores(self):
+        before = single_flight_stats()
+        self.assertEqual(single_flight('page', 'v1', self.compute()), 'fresh')
+        self.assertCounted(before, 'miss')
+        before = single_flight_stats()
+        self.assertEqual(single_flight('page', 'v1', self.compute('again')), 'fresh')
+        self.assertCounted(before, 'hit')
+        self.assertEqual(self.computed, ['fresh'])
+
+    def test_new_version_recomputes(self):
+        single_flight('page', 'v1', self.compute('old'))
+        self.assertEqual(single_flight('page', 'v2', self.compute('new')), 'new')
+
+    def test_uncacheable_result_is_not_stored(self):
+        self.assertIsNone(single_flight('page', 'v1', self.compute(None)))
+        self.assertIsNone(cache.get('page'))
+
+    def test_waiter_coalesces_onto_leader(self):
+        leader, leader_result = self.in_thread('page', 'v1', self.compute('fresh', block=True))
+        self.assertTrue(self.entered.wait(5))
+        before = single_flight_stats()
+        waiter, waiter_result = self.in_thread('page', 'v1', self.compute('duplicate'))
+        # Let the waiter find the flight before the leader finishes.
+        time.sleep(0.2)
+        self.proceed.set()
+        leader.join(5)
+        waiter.join(5)
+        self.assertEqual((leader_result, waiter_result), (['fresh'], ['fresh']))
+        self.assertEqual(self.computed, ['fresh'])
+        self.assertEqual(single_flight_stats()['coalesced'] - before['coalesced'], 1)
+
+    def test_stale_value_served_while_revalidating(self):
+        single_flight('page', 'v1', self.compute('old'))
+        leader, leader_result = self.in_thread('page', 'v2', self.compute('new', block=True))
+        self.assertTrue(self.entered.wait(5))
+        before = single_flight_stats()
+        # Answered at once from the old entry, without waiting for the leader.
+        self.assertEqual(single_flight('page', 'v2', self.compute('duplicate')), 'old')
+        self.assertCounted(before, 'stale')
+        self.proceed.set()
+        leader.join(5)
+        self.assertEqual(leader_result, ['new'])
+        self.assertEqual(single_flight('page', 'v2', self.compute('again')), 'new')
+        self.assertEqual(self.computed, ['old', 'new'])
+
+    def test_stale_value_served_while_another_process_holds_the_lock(self):
+        single_flight('page', 'v1', self.compute('old'))
+        lock = SharedLock('page:lock')
+        self.assertTrue(lock.acquire())
+        try:
+            self.assertEqual(single_flight('page', 'v2', self.compute('new')), 'old')
+        finally:
+            lock.release()
+        self.assertEqual(self.computed, ['old'])
+
+
+class SharedLockTests(TestCase):
+    def test_file_cache_lock_excludes_other_holders(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_cache = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}
+            with override_settings(CACHES=file_cache):
+                first, second = SharedLock('page:lock'), SharedLock('page:lock')
+                self.assertFalse(first.held())
+                self.assertTrue(first.acquire())
+                # A second holder, as another process would be, is refused.
+                self.assertTrue(second.held())
+                self.assertFalse(second.acquire())
+                first.release()
+                self.assertFalse(second.held())
+                self.assertTrue(second.acquire())
+                second.release()
+                # The lock is a file lock, not a cache entry that cull or clear() could drop.
+                self.assertIsNone(cache.get('page:lock'))
+
+
+class TechFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.python = Skill.objects.create(name='Python', proficiency=90)
+        cls.pytorch = Skill.objects.create(name='PyTorch', proficiency=70)
+        cls.django = Skill.objects.create(name='Django', proficiency=80)
+        cls.cpp = Skill.objects.create(name='C++', slug='cpp', proficiency=60)
+        cls.web = Project.objects.create(title='Web', description='d')
+        cls.web.tech_stack.set([cls.python, cls.django])
+        cls.ml = Project.objects.create(title='ML', description='d')
+        cls.ml.tech_stack.set([cls.python, cls.pytorch])
+        cls.engine = Project.objects.create(title='Engine', description='d')
+        cls.engine.tech_stack.set([cls.cpp])
+
+    def filtered(self, query):
+        terms, match = parse_tech_terms(QueryDict(query))
+        return set(filter_projects_by_tech(Project.objects.all(), terms, match))
+
+    def test_parse_repeated_and_comma_separated_terms(self):
+        terms, match = parse_tech_terms(QueryDict('tech=Python,%20django%20&tech=PYTHON&tech=,&tech=react'))
+        self.assertEqual(terms, ['python', 'django', 'react'])
+        self.assertEqual(match, MATCH_ANY)
+        self.assertEqual(parse_tech_terms(QueryDict('tech=a&match=all'))[1], MATCH_ALL)
+        self.assertEqual(parse_tech_terms(QueryDict('tech=a&match=bogus'))[1], MATCH_ANY)
+
+    def test_prefix_and_slug_resolution(self):
+        self.assertEqual(set(resolve_tech_term('py')), {self.python.pk, self.pytorch.pk})
+        self.assertEqual(set(resolve_tech_term('pyth')), {self.python.pk})
+        self.assertEqual(resolve_tech_term('cpp'), [self.cpp.pk])
+        self.assertEqual(resolve_tech_term('c++'), [self.cpp.pk])
+        self.assertEqual(resolve_tech_term('go'), [])
+
+    def test_prefix_upper_bound(self):
+        self.assertEqual(prefix_upper_bound('py'), 'pz')
+        self.assertEqual(prefix_upper_bound('a\U0010ffff'), 'b')
+        self.assertIsNone(prefix_upper_bound('\U0010ffff'))
+
+    def test_match_any(self):
+        self.assertEqual(self.filtered('tech=django,cpp'), {self.web, self.engine})
+        # A project matching several terms is listed once.
+        self.assertEqual(list(filter_projects_by_tech(Project.objects.all(), ['python', 'py'])).count(self.ml), 1)
+
+    def test_match_all(self):
+        self.assertEqual(self.filtered('tech=python&tech=django&match=all'), {self.web})
+        self.assertEqual(self.filtered('tech=py,torch&match=all'), set())
+        self.assertEqual(self.filtered('tech=python,pytorch&match=all'), {self.ml})
+
+    def test_no_terms_keeps_every_project(self):
+        self.assertEqual(self.filtered('tech=,'), {self.web, self.ml, self.engine})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TokenBucketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.limiter = TokenBucketLimiter()
+        self.buckets = {'per_ip': ('bucket', 3, 60)}
+
+    def test_burst_then_refused_until_refilled(self):
+        for _ in range(3):
+            self.assertEqual(self.limiter.acquire(self.buckets, now=1000.0), (None, 0))
+        # One token comes back every 60 / 3 seconds.
+        self.assertEqual(self.limiter.acquire(self.buckets, now=1000.0), ('per_ip', 20.0))
+        self.assertEqual(self.limiter.acquire(self.buckets, now=1019.0), ('per_ip', 1.0))
+        self.assertEqual(self.limiter.acquire(self.buckets, now=1020.0), (None, 0))
+        self.assertEqual(self.limiter.acquire(self.buckets, now=1020.0)[0], 'per_ip')
+        # A full period later the whole burst is available again.
+        for _ in range(3):
+            self.assertEqual(self.limiter.acquire(self.buckets, now=1100.0), (None, 0))
+
+    def test_refused_request_takes_no_token(self):
+        buckets = {'per_ip': ('ip', 5, 60), 'global': ('global', 1, 60)}
+        self.assertEqual(self.limiter.acquire(buckets, now=1000.0), (None, 0))
+        self.assertEqual(self.limiter.acquire(buckets, now=1000.0)[0], 'global')
+        # The refusal by the global bucket left the per-IP bucket alone.
+        self.assertEqual(self.limiter.acquire({'per_ip': ('ip', 5, 60)}, now=1000.0), (None, 0))
+        self.assertEqual(cache.get('ip'), 1000.0 + 2 * 12)
+
+    def test_falls_back_to_process_buckets_when_cache_fails(self):
+        key = _key('portfolio_ratelimit_fallbacks_total', None)
+        before = registry._counters.get(key, 0)
+        with mock.patch('portfolio.ratelimit.cache.get_many', side_effect=ConnectionError('down')), \
+                self.assertLogs('portfolio.ratelimit', 'WARNING'):
+            for _ in range(3):
+                self.assertEqual(self.limiter.acquire(self.buckets, now=1000.0), (None, 0))
+            self.assertEqual(self.limiter.acquire(self.buckets, now=1000.0), ('per_ip', 20.0))
+        self.assertEqual(registry._counters[key] - before, 4)
+        self.assertIsNone(cache.get('bucket'))
+
+    def test_buckets_are_per_ip_and_per_view(self):
+        rule = {'per_ip': (1, 60)}
+        factory = RequestFactory()
+        first = factory.get('/', REMOTE_ADDR='10.0.0.1')
+        second = factory.get('/', REMOTE_ADDR='10.0.0.2')
+        self.assertIsNone(check_rate_limit(first, 'contact', rule))
+        self.assertIsNotNone(check_rate_limit(first, 'contact', rule))
+        self.assertIsNone(check_rate_limit(second, 'contact', rule))
+        self.assertIsNone(check_rate_limit(first, 'project_filter', rule))
+
+    def test_client_ip_behind_proxies(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.9', HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2')
+        self.assertIsNone(check_rate_limit(request, 'contact', {'per_ip': (1, 60)}, proxy_count=1))
+        # The address added by the trusted proxy is the client, not the proxy itself.
+        self.assertIsNotNone(cache.get('portfolio:ratelimit:contact:2.2.2.2'))
+
+
+@override_settings(
+    CACHES=TEST_CACHES, STORAGES=TEST_STORAGES, ALLOWED_HOSTS=['testserver'], RATE_LIMIT_ENABLED=True,
+    RATE_LIMITS={'project_filter': {'methods': ['GET'], 'per_ip': (2, 60)}},
+)
+@mock.patch('portfolio.ratelimit.time')
+class RateLimitMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_429_with_retry_after_then_refill(self, clock):
+        clock.time.return_value = 1000.0
+        url = reverse('project_filter')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(response.json(), {'error': 'Too many requests. Please try again later.'})
+
+        clock.time.return_value = 1029.5
+        self.assertEqual(self.client.get(url)['Retry-After'], '1')
+        clock.time.return_value = 1030.0
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_other_clients_and_methods_are_not_limited(self, clock):
+        clock.time.return_value = 1000.0
+        url = reverse('project_filter')
+        for _ in range(3):
+            self.client.get(url)
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+        # Only GET is limited for this view.
+        self.assertNotEqual(self.client.post(url).status_code, 429)
+        # Views without a rule are never limited.
+        self.assertEqual(self.client.get(reverse('about')).status_code, 200)
+
+
+class AsyncLogHandlerTests(TestCase):
+    def test_other_handlers_keep_args_and_traceback(self):
+        handler = AsyncLogHandler(queue_size=10)
+        # Not started, so the queued copy can be inspected.
+        handler._ensure_writer = lambda: None
+        later = mock.Mock(level=logging.NOTSET)
+        logger = logging.getLogger('portfolio.tests.async')
+        logger.addHandler(handler)
+        logger.addHandler(later)
+        logger.propagate = False
+        try:
+            try:
+                1 / 0
+            except ZeroDivisionError:
+                logger.exception('failed for %s', 'user')
+        finally:
+            logger.removeHandler(handler)
+            logger.removeHandler(later)
+
+        record = later.handle.call_args.args[0]
+        self.assertEqual(record.args, ('user',))
+        self.assertIs(record.exc_info[0], ZeroDivisionError)
+        queued = handler.queue.get_nowait()
+        self.assertIsNot(queued, record)
+        self.assertEqual((queued.msg, queued.args, queued.exc_info), ('failed for user', None, None))
+        self.assertIn('ZeroDivisionError', json.loads(JsonFormatter().format(queued))['exception'])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class MetricsEndpointTests(TestCase):
+    @override_settings(METRICS_TOKEN='', DEBUG=False)
+    def test_closed_without_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=True)
+    def test_open_without_token_in_debug(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret', DEBUG=True)
+    def test_token_required_when_set(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403,
+        )
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+
+class SynchronousExecutor:
+    def submit(self, function, *args):
+        function(*args)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RelatedProjectsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.skills = {name: Skill.objects.create(name=name, proficiency=50) for name in 'abcde'}
+        stacks = ['abc', 'abc', 'ab', 'abd', 'ad', 'abe', 'e']
+        cls.projects = []
+        for number, stack in enumerate(stacks, 1):
+            project = Project.objects.create(title=f'P{number}', description='d')
+            project.tech_stack.set([cls.skills[name] for name in stack])
+            cls.projects.append(project)
+        rebuild_related()
+
+    def setUp(self):
+        cache.clear()
+        # Run the background refresh inline, on the test's own connection.
+        for patcher in (
+            mock.patch.dict('portfolio.related._executor', {'pid': os.getpid(), 'pool': SynchronousExecutor()}),
+            mock.patch('portfolio.related.connections'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def related(self, number):
+        rows = RelatedProject.objects.filter(project=self.projects[number - 1]).order_by('rank')
+        return [(self.projects.index(row.related) + 1, round(row.score, 3)) for row in rows]
+
+    def test_ranked_by_jaccard_similarity(self):
+        # P4 {a,b,d} and P6 {a,b,e} tie at 2/4; the lower id wins the last place.
+        self.assertEqual(self.related(1), [(2, 1.0), (3, 0.667), (4, 0.5)])
+        self.assertEqual(self.related(7), [(6, 0.333)])
+
+    def test_project_never_lists_itself(self):
+        for number in range(1, 8):
+            self.assertNotIn(number, [related for related, score in self.related(number)])
+
+    def test_pruned_ranking_matches_brute_force(self):
+        ids = [project.pk for project in self.projects]
+        skill_sets, projects_by_skill = _load_neighbourhood(ids)
+        for project_id in ids:
+            scores = _similarity_scores(project_id, skill_sets, projects_by_skill)
+            expected = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:3]
+            self.assertEqual(_top_related(project_id, skill_sets, projects_by_skill), expected)
+
+    def test_tech_stack_change_refreshes_neighbours(self):
+        before = content_versions([Project])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.projects[6].tech_stack.set([self.skills[name] for name in 'abc'])
+        self.assertEqual(self.related(7), [(1, 1.0), (2, 1.0), (3, 0.667)])
+        # P7 now ties with P2 for P1's first place and pushes P4 out.
+        self.assertEqual(self.related(1), [(2, 1.0), (7, 1.0), (3, 0.667)])
+        self.assertEqual(self.related(6), [(3, 0.667), (1, 0.5), (2, 0.5)])
+        self.assertNotEqual(content_versions([Project]), before)
+
+    def test_deleted_project_is_replaced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.projects[1].delete()
+        self.assertEqual(self.related(1), [(3, 0.667), (4, 0.5), (6, 0.5)])
+
+    def test_deleted_skill_refreshes_projects_using_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.skills['c'].delete()
+        self.assertEqual(self.related(1), [(2, 1.0), (3, 1.0), (4, 0.667)])
+
+
+@override_settings(CACHES=TEST_CACHES, STORAGES=TEST_STORAGES, ALLOWED_HOSTS=['testserver'])
+class PaginationLinkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        python = Skill.objects.create(name='Python', proficiency=90)
+        for number in range(20):
+            Project.objects.create(title=f'Project {number}', description='d').tech_stack.set([python])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unfiltered_links_use_page_paths(self):
+        response = self.client.get(reverse('projects', kwargs={'page': 2}))
+        self.assertContains(response, 'href="%s"' % reverse('projects'))
+        self.assertContains(response, 'href="%s"' % reverse('projects', kwargs={'page': 3}))
+
+    def test_filtered_links_keep_filter_on_page_paths(self):
+        response = self.client.get(reverse('projects', kwargs={'page': 2}), {'tech': 'python'})
+        next_url = reverse('projects', kwargs={'page': 3}) + '?tech=python'
+        self.assertContains(response, 'href="%s"' % next_url)
+        self.assertNotContains(response, 'href="?page=')
+        # Following the link reaches the next page instead of staying on page 2.
+        self.assertEqual(self.client.get(next_url).context['page_obj'].number, 3)
+
+
+class FailingBackend(BaseEmailBackend):
+    """Every send fails, as an SMTP server refusing the message would."""
+
+    def send_messages(self, email_messages):
+        raise SMTPException('refused')
+
+
+class UnreachableBackend(BaseEmailBackend):
+    def open(self):
+        raise OSError('connection refused')
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_OUTBOX_THREAD=False, EMAIL_OUTBOX_MAX_ATTEMPTS=3, EMAIL_TIMEOUT=10,
+)
+class OutboxTests(TestCase):
+    def queue(self, **kwargs):
+        return OutboxEmail.objects.create(
+            subject='Subject', body='Body', from_email='from@example.com', recipients=['to@example.com'], **kwargs
+        )
+
+    def test_delivers_due_email(self):
+        email = self.queue()
+        self.assertEqual(outbox.deliver_all(), 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.SENT)
+        self.assertEqual(email.attempts, 1)
+        self.assertIsNotNone(email.sent_at)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['to@example.com'])
+
+    def test_skips_email_not_yet_due(self):
+        email = self.queue(next_attempt_at=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(outbox.deliver_all(), 0)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertEqual(mail.outbox, [])
+
+    def test_claim_leases_rows(self):
+        email = self.queue()
+        self.assertEqual(outbox.claim_due(), [email])
+        # Claimed rows are hidden from other workers until the lease ends.
+        self.assertEqual(outbox.claim_due(), [])
+        email.refresh_from_db()
+        self.assertGreater(email.next_attempt_at, timezone.now() + outbox.CLAIM_LEASE - timedelta(seconds=5))
+
+    @override_settings(EMAIL_BACKEND='portfolio.tests.FailingBackend')
+    def test_failure_is_retried_with_backoff(self):
+        email = self.queue()
+        before = timezone.now()
+        outbox.deliver_all()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.last_error, 'SMTPException: refused')
+        self.assertGreaterEqual(email.next_attempt_at, before + outbox.BACKOFF_BASE / 2)
+        self.assertLessEqual(email.next_attempt_at, timezone.now() + outbox.BACKOFF_BASE)
+
+    @override_settings(EMAIL_BACKEND='portfolio.tests.FailingBackend')
+    def test_gives_up_after_max_attempts(self):
+        email = self.queue(attempts=2)
+        outbox.deliver_all()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.FAILED)
+        self.assertEqual(email.attempts, 3)
+        # A failed email is never claimed again.
+        OutboxEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.claim_due(), [])
+
+    @override_settings(EMAIL_BACKEND='portfolio.tests.UnreachableBackend')
+    def test_connection_failure_fails_the_batch(self):
+        emails = [self.queue(), self.queue()]
+        self.assertEqual(outbox.deliver_due(), 2)
+        for email in emails:
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, 1)
+            self.assertEqual(email.last_error, 'OSError: connection refused')
+
+    def test_send_that_could_outlast_the_lease_is_not_started(self):
+        email = self.queue()
+        with override_settings(EMAIL_TIMEOUT=outbox.CLAIM_LEASE.total_seconds()):
+            self.assertEqual(outbox.deliver_due(), 1)
+        email.refresh_from_db()
+        # Still leased and unsent: it becomes due again when the lease ends.
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertEqual(email.attempts, 0)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(mail.outbox, [])
+
+    def test_retry_delay_is_capped(self):
+        for attempts in (1, 5, 20):
+            delay = outbox.retry_delay(attempts)
+            expected = min(outbox.BACKOFF_BASE * 2 ** (attempts - 1), outbox.BACKOFF_MAX)
+            self.assertGreaterEqual(delay, expected / 2)
+            self.assertLessEqual(delay, expected)
+
+    @override_settings(EMAIL_OUTBOX_THREAD=True)
+    def test_notify_outside_a_server_process_starts_no_thread(self):
+        self.queue()
+        outbox.notify_outbox()
+        self.assertFalse(outbox.worker.started)
+        self.assertNotIn('outbox-worker', [thread.name for thread in threading.enumerate()])
+        # The row is left for a server's worker or send_outbox.
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.PENDING)
+        self.assertEqual(mail.outbox, [])
+
+
+SPAM_TEXTS = [
+    'cheap viagra pills online buy now',
+    'win free casino bonus click now',
+    'buy cheap followers and likes now',
+    'crypto investment doubles your money fast',
+    'free casino spins claim your bonus',
+]
+HAM_TEXTS = [
+    'question about your django portfolio project',
+    'would you be available for a python contract',
+    'loved the project detail page and its design',
+    'interview invitation for a backend developer role',
+    'feedback on your open source django app',
+]
+
+
+@override_settings(
+    CACHES=TEST_CACHES, STORAGES=TEST_STORAGES, ALLOWED_HOSTS=['testserver'], EMAIL_OUTBOX_THREAD=False,
+    RATE_LIMIT_ENABLED=False, SPAM_MIN_FILL_SECONDS=3, SPAM_DUPLICATE_LIMIT=1, SPAM_THRESHOLD=0.95,
+)
+class SpamScreenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        spam._classifier['expires'] = 0.0
+        self.issued_at = 1_000_000.0
+        self.now = self.issued_at + 10
+
+    def submission(self, message='Hello, I would like to talk about a project.', **data):
+        return {
+            'name': 'Ada', 'email': 'ada@example.com', 'subject': 'Hello', 'message': message,
+            'website': '', 'form_token': spam.issue_form_token(self.issued_at), **data,
+        }
+
+    def test_accepts_genuine_submission(self):
+        self.assertIsNone(spam.screen(self.submission(), now=self.now))
+
+    def test_honeypot(self):
+        self.assertEqual(spam.screen(self.submission(website='http://spam.example'), now=self.now), 'honeypot')
+
+    def test_missing_or_forged_token(self):
+        self.assertEqual(spam.screen(self.submission(form_token=''), now=self.now), 'token')
+        self.assertEqual(spam.screen(self.submission(form_token='1000000.0:forged'), now=self.now), 'token')
+
+    def test_filled_too_fast(self):
+        self.assertEqual(spam.screen(self.submission(), now=self.issued_at + 1), 'too_fast')
+
+    def test_duplicate_content(self):
+        self.assertIsNone(spam.screen(self.submission(), now=self.now))
+        # Whitespace and case do not make a repeat look new.
+        repeat = self.submission(message='  hello, I would like to TALK about a project. ')
+        self.assertEqual(spam.screen(repeat, now=self.now + 1), 'duplicate')
+        # Outside the window it is accepted again.
+        self.assertIsNone(spam.screen(repeat, now=self.now + 2 + settings.SPAM_DUPLICATE_WINDOW))
+
+    def test_classifier(self):
+        for text in SPAM_TEXTS:
+            ContactMessage.objects.create(name='x', email='x@example.com', subject='', message=text, is_spam=True)
+        for text in HAM_TEXTS:
+            ContactMessage.objects.create(name='x', email='x@example.com', subject='', message=text)
+        model = spam.train_classifier()
+        self.assertTrue(model.ready)
+        self.assertEqual(
+            spam.screen(self.submission(message='free casino bonus buy cheap pills now'), now=self.now), 'classifier',
+        )
+        self.assertIsNone(spam.screen(self.submission(message='a question about your django project'), now=self.now))
+
+    def test_classifier_does_not_vote_until_trained_enough(self):
+        model = spam.NaiveBayes.train(SPAM_TEXTS[:4], HAM_TEXTS)
+        self.assertFalse(model.ready)
+        self.assertIsNone(
+            spam.screen(self.submission(message='free casino bonus buy cheap pills now'), now=self.now, classifier=model),
+        )
+
+    def test_rejected_submission_is_not_stored(self):
+        response = self.client.post(reverse('contact'), self.submission(website='http://spam.example'))
+        self.assertRedirects(response, reverse('contact'), fetch_redirect_response=False)
+        self.assertFalse(ContactMessage.objects.exists())
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_accepted_submission_queues_email(self):
+        data = self.submission(form_token=spam.issue_form_token(timezone.now().timestamp() - 10))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('contact'), data)
+        self.assertRedirects(response, reverse('contact'), fetch_redirect_response=False)
+        message = ContactMessage.objects.get()
+        self.assertEqual(OutboxEmail.objects.get().contact_message, message)
+
+
+class MinifyTests(TestCase):
+    def test_collapses_whitespace(self):
+        self.assertEqual(minify_html('<p>  one\n\n   two   </p>\n\n<p>three</p>'), '<p> one\ntwo </p>\n<p>three</p>')
+
+    def test_collapses_tag_whitespace_and_class_values_only(self):
+        self.assertEqual(
+            minify_html('<div  class="  a\n  b "\n  title="  kept  as is ">x</div>'),
+            '<div class="a b" title="  kept  as is ">x</div>',
+        )
+
+    def test_drops_comments_except_conditional_ones(self):
+        self.assertEqual(
+            minify_html('a <!-- note --> b<!--[if IE]><p>old</p><![endif]-->'),
+            'a b<!--[if IE]><p>old</p><![endif]-->',
+        )
+
+    def test_preserves_raw_blocks(self):
+        blocks = (
+            '<pre>  keep\n   this  </pre>',
+            '<textarea>  typed\n  text </textarea>',
+            '<script>if (a  <  b) {  f("  x  "); }</script>',
+            '<style>a  >  b { color:  red }</style>',
+        )
+        for block in blocks:
+            self.assertEqual(minify_html(f'<div>   {block}   </div>'), f'<div> {block} </div>')
+
+    def test_is_idempotent(self):
+        html = '<html>\n  <body class=" x  y ">\n  <!-- c -->  <pre> p </pre>\n  <p>  t  </p></body></html>'
+        once = minify_html(html)
+        self.assertEqual(minify_html(once), once)
+
+    def test_response_byte_counts(self):
+        html = '<p>   text   </p>   <!-- comment -->\n'
+        response = HttpResponse(html)
+        response['Content-Length'] = str(len(response.content))
+        saved = minify_response(response)
+        self.assertEqual(response.content, b'<p> text </p>\n')
+        self.assertEqual(saved, len(html.encode()) - len(response.content))
+        self.assertEqual(response.html_bytes_saved, saved)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+    def test_only_plain_html_is_minified(self):
+        self.assertTrue(is_html(HttpResponse('<p></p>', content_type='text/html; charset=utf-8')))
+        self.assertFalse(is_html(JsonResponse({})))
+        encoded = HttpResponse(b'...', content_type='text/html')
+        encoded['Content-Encoding'] = 'gzip'
+        self.assertFalse(is_html(encoded))
+
+
+@override_settings(CACHES=TEST_CACHES, STORAGES=TEST_STORAGES, ALLOWED_HOSTS=['testserver'], HTML_MINIFY=True)
+class MinifyMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_personal_info()
+
+    def test_counts_bytes_saved_for_cached_pages_too(self):
+        key = _key('portfolio_html_bytes_saved_total', {'url_name': 'about'})
+        before = registry._counters.get(key, 0)
+        first = self.client.get(reverse('about'))
+        saved = registry._counters[key] - before
+        self.assertGreater(saved, 0)
+        self.assertEqual(minify_html(first.content.decode()), first.content.decode())
+        # Served from the page cache, already minified: counted, not minified again.
+        second = self.client.get(reverse('about'))
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(registry._counters[key] - before, 2 * saved)
@@ -3,34 +3,48 @@ from django.views.generic import ListView, DetailView, TemplateView
 from django.views.generic.edit import FormView
 from django.contrib import messages
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from django.views.static import serve
 from .models import (
     Project, ContactMessage, Certification, Education, 
     Skill, PersonalInfo
 )
 from .forms import ContactForm
+from . import queries
+from .filters import filter_projects_by_tech, parse_tech_terms
+from .cache import CachedPageMixin, cached_page, get_personal_info
+from .metrics import registry
+from .outbox import notify_outbox
+from .spam import screen
+from .storage import CACHE_CONTROL, is_immutable
 
 
-class HomeView(TemplateView):
+class HomeView(CachedPageMixin, TemplateView):
     template_name = 'portfolio/home.html'
+    cache_dependencies = (Project, Skill, PersonalInfo)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context.update({
-            'personal_info': PersonalInfo.objects.first(),
-            'featured_projects': Project.objects.filter(featured=True)[:3],
+            'personal_info': get_personal_info(),
+            'featured_projects': queries.featured_projects(),
         })
         return context
 
 
-class AboutView(TemplateView):
+class AboutView(CachedPageMixin, TemplateView):
     template_name = 'portfolio/about.html'
+    cache_dependencies = (Skill, Education, Certification, PersonalInfo)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context.update({
-            'personal_info': PersonalInfo.objects.first(),
+            'personal_info': get_personal_info(),
             'skills': Skill.objects.filter(is_active=True),
             'education': Education.objects.all(),
             'certifications': Certification.objects.filter(is_active=True),
@@ -38,38 +52,42 @@ class AboutView(TemplateView):
         return context
 
 
-class ProjectsView(ListView):
+class ProjectsView(CachedPageMixin, ListView):
     model = Project
     template_name = 'portfolio/projects.html'
     context_object_name = 'projects'
     paginate_by = 6
+    cache_dependencies = (Project, Skill, PersonalInfo)
     
     def get_queryset(self):
-        queryset = Project.objects.all()
-        tech_filter = self.request.GET.get('tech')
-        if tech_filter:
-            queryset = queryset.filter(tech_stack__name__icontains=tech_filter)
-        return queryset
+        self.tech_terms, self.tech_match = parse_tech_terms(self.request.GET)
+        queryset = filter_projects_by_tech(
+            Project.objects.all(), self.tech_terms, self.tech_match
+        )
+        return queries.projects_with_tech_stack(queryset)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['tech_skills'] = Skill.objects.filter(is_active=True)
-        context['selected_tech'] = self.request.GET.get('tech', '')
+        context['selected_tech'] = ','.join(self.tech_terms)
+        filter_query = self.request.GET.copy()
+        filter_query.pop('page', None)
+        context['filter_query'] = filter_query.urlencode()
         return context
 
 
-class ProjectDetailView(DetailView):
+class ProjectDetailView(CachedPageMixin, DetailView):
     model = Project
     template_name = 'portfolio/project_detail.html'
     context_object_name = 'project'
+    cache_dependencies = (Project, Skill, PersonalInfo)
+    
+    def get_queryset(self):
+        return queries.projects_with_tech_stack()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['related_projects'] = Project.objects.exclude(
-            id=self.object.id
-        ).filter(
-            tech_stack__in=self.object.tech_stack.all()
-        ).distinct()[:3]
+        context['related_projects'] = queries.related_projects(self.object)
         return context
 
 
@@ -83,30 +101,37 @@ class ContactView(FormView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['personal_info'] = PersonalInfo.objects.first()
+        context['personal_info'] = get_personal_info()
         return context
     
     def form_valid(self, form):
-        # Save the contact message
-        form.save()
-        
-        # Try to send email notification
-        email_sent = form.send_email()
-        
-        if email_sent:
+        spam_reason = screen(form.cleaned_data)
+        if spam_reason:
+            # Answer as if accepted so bots learn nothing; nothing is stored or sent.
+            registry.inc('portfolio_contact_submissions_total', {'result': f'spam_{spam_reason}'})
             messages.success(
                 self.request, 
                 'Thank you for your message! I\'ll get back to you soon.'
             )
-        else:
-            messages.warning(
-                self.request, 
-                'Your message has been saved, but there was an issue sending the notification email.'
-            )
+            return redirect(self.get_success_url())
+
+        # Save the contact message and its notification email together; the
+        # email is sent by the outbox worker once the transaction commits.
+        with transaction.atomic():
+            contact_message = form.save()
+            form.queue_email(contact_message)
+            transaction.on_commit(notify_outbox)
+        registry.inc('portfolio_contact_submissions_total', {'result': 'accepted'})
+
+        messages.success(
+            self.request, 
+            'Thank you for your message! I\'ll get back to you soon.'
+        )
         
         return super().form_valid(form)
     
     def form_invalid(self, form):
+        registry.inc('portfolio_contact_submissions_total', {'result': 'invalid'})
         messages.error(
             self.request, 
             'Please correct the errors below and try again.'
@@ -114,26 +139,17 @@ class ContactView(FormView):
         return super().form_invalid(form)
 
 
+@cached_page(Project, Skill)
 def project_filter_ajax(request):
     """AJAX endpoint for filtering projects by technology"""
-    tech = request.GET.get('tech', '')
-    projects = Project.objects.all()
-    
-    if tech:
-        projects = projects.filter(tech_stack__name__icontains=tech)
+    terms, match = parse_tech_terms(request.GET)
+    projects = filter_projects_by_tech(Project.objects.all(), terms, match)
     
     # Convert to JSON-serializable format
-    projects_data = []
-    for project in projects:
-        projects_data.append({
-            'id': project.id,
-            'title': project.title,
-            'description': project.description,
-            'image_url': project.image.url if project.image else '',
-            'github_url': project.github_url,
-            'live_url': project.live_url,
-            'tech_stack': [skill.name for skill in project.tech_stack.all()],
-        })
+    projects_data = [
+        queries.project_payload(project)
+        for project in queries.projects_with_tech_stack(projects)
+    ]
     
     return JsonResponse({'projects': projects_data})
 
@@ -141,3 +157,27 @@ def project_filter_ajax(request):
 def loading_screen(request):
     """Simple loading screen view"""
     return render(request, 'portfolio/loading.html')
+
+
+@require_GET
+def metrics(request):
+    """Prometheus scrape endpoint aggregating every worker process
+
+    Scrapers authenticate with METRICS_TOKEN; without one it is only open with DEBUG.
+    """
+    if not settings.METRICS_TOKEN:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def media(request, path):
+    """Uploaded file; content-named ones are cached by browsers for a year"""
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_immutable(path):
+        response['Cache-Control'] = CACHE_CONTROL
+    return response
@@ -1,7 +1,10 @@
 from pathlib import Path
 import os
+import tempfile
 import dj_database_url
 
+from portfolio.release import detect_release
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY", "unsafe-default-key")
@@ -20,18 +23,24 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    # Before staticfiles so its collectstatic (which builds the stylesheet) wins.
+    'portfolio',
     'django.contrib.staticfiles',
     'crispy_forms',
     'crispy_tailwind',
-    'portfolio',
 ]
 
 MIDDLEWARE = [
+    'portfolio.middleware.MetricsMiddleware',
+    'portfolio.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'portfolio.middleware.CompressionMiddleware',
+    'portfolio.middleware.HtmlMinifyMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'portfolio.middleware.RateLimitMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -51,6 +60,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'portfolio.context_processors.personal_info',
+                'portfolio.context_processors.assets',
             ],
         },
     },
@@ -71,6 +81,19 @@ DATABASES = {
     }
 }
 
+# Shared by every process (content versions, page cache, locks, rate limits),
+# so the default is the file-based cache rather than a per-process one; set
+# CACHE_BACKEND/CACHE_LOCATION to use Redis or Memcached across hosts. With
+# the file-based cache, page cache locks are flock()ed files in its directory
+# (see portfolio.cache.SharedLock); other backends need an atomic add().
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'portfolio-cache')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '10000'))},
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -96,7 +119,29 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Uploads are named after a digest of their content (see portfolio/storage.py);
+# collected static files get content-hashed names and compressed copies that
+# WhiteNoise serves with far-future caching.
+STORAGES = {
+    'default': {'BACKEND': 'portfolio.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+# Identifies the deployed code; part of page cache keys and ETags so a
+# deploy with changed templates or static files never serves pages, or
+# answers 304s, from the old one. Render provides the commit; elsewhere it is
+# derived from the git HEAD, the collected static manifest and the templates
+# when the process starts.
+RELEASE = os.environ.get('RENDER_GIT_COMMIT') or detect_release(BASE_DIR, STATIC_ROOT, TEMPLATES[0]['DIRS'])
+# Serve MEDIA_URL from the app, with far-future caching for content-named files
+SERVE_MEDIA = os.environ.get('SERVE_MEDIA', str(DEBUG)) == 'True'
+
+# Widths (px) of the resized copies made of uploaded images, and the modern
+# formats they are also encoded in, best first (see portfolio/images.py)
+IMAGE_WIDTHS = (320, 640, 960, 1280, 1920)
+IMAGE_MODERN_FORMATS = ('avif', 'webp')
+IMAGE_JPEG_QUALITY = 82
+IMAGE_WEBP_QUALITY = 80
+IMAGE_AVIF_QUALITY = 60
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -105,6 +150,9 @@ EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '587'))
 EMAIL_USE_TLS = True
+# Seconds before a stalled SMTP connection fails; keeps a hung server from
+# blocking the outbox worker past its claim lease.
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', '30'))
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
 
@@ -113,6 +161,20 @@ if not EMAIL_HOST_USER or not EMAIL_HOST_PASSWORD:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
     print("⚠️  Email credentials not configured. Emails will be printed to console.")
 
+# Contact emails are queued in the OutboxEmail table. A background thread in
+# each web process delivers them after commit; disable it when running the
+# send_outbox command as a separate worker instead.
+EMAIL_OUTBOX_THREAD = os.environ.get('EMAIL_OUTBOX_THREAD', 'True') == 'True'
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.environ.get('EMAIL_OUTBOX_POLL_INTERVAL', '60'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', '8'))
+
+# Contact form spam screen (see portfolio/spam.py)
+SPAM_MIN_FILL_SECONDS = float(os.environ.get('SPAM_MIN_FILL_SECONDS', '3'))
+SPAM_DUPLICATE_WINDOW = int(os.environ.get('SPAM_DUPLICATE_WINDOW', 60 * 60))
+SPAM_DUPLICATE_LIMIT = int(os.environ.get('SPAM_DUPLICATE_LIMIT', '1'))
+SPAM_THRESHOLD = float(os.environ.get('SPAM_THRESHOLD', '0.95'))
+SPAM_TRAINING_HAM_LIMIT = int(os.environ.get('SPAM_TRAINING_HAM_LIMIT', '5000'))
+
 # Crispy Forms Configuration
 CRISPY_ALLOWED_TEMPLATE_PACKS = "tailwind"
 CRISPY_TEMPLATE_PACK = "tailwind"
@@ -122,20 +184,65 @@ SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
+# Fraction of requests measured by ServerTimingMiddleware (0 disables it)
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get('SERVER_TIMING_SAMPLE_RATE', '1.0' if DEBUG else '0.01'))
+
+# Strip comments and redundant whitespace from HTML responses (portfolio/minify.py)
+HTML_MINIFY = os.environ.get('HTML_MINIFY', 'True') == 'True'
+# Responses smaller than this many bytes are not compressed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+
+# Token-bucket rate limits per URL name: (requests, seconds) for each client
+# IP and for all clients together, applied to the listed methods.
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True') == 'True'
+RATE_LIMITS = {
+    'contact': {'methods': ['POST'], 'per_ip': (5, 10 * 60), 'global': (100, 10 * 60)},
+    'project_filter': {'methods': ['GET'], 'per_ip': (60, 60), 'global': (1200, 60)},
+}
+# Number of reverse proxies in front of the app whose X-Forwarded-For entries
+# are trusted to identify the client (1 on Render).
+RATE_LIMIT_PROXY_COUNT = int(os.environ.get('RATE_LIMIT_PROXY_COUNT', '0'))
+
+# Prometheus metrics: per-process snapshots are written to METRICS_DIR and
+# merged by /metrics, so every worker process must share this directory.
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'portfolio-metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+# Bearer token required to read /metrics; when empty it is only served with DEBUG
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # Logging
+# JSON logs go to stderr unless LOG_FILE is set (logs/django.log with DEBUG).
+# Worker processes share the file and never rotate it; rotate it with
+# logrotate, which the handler notices and reopens the file.
+LOG_FILE = os.environ.get('LOG_FILE', str(BASE_DIR / 'logs' / 'django.log') if DEBUG else '')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'portfolio.log.JsonFormatter',
+        },
+    },
     'handlers': {
-        'file': {
+        # Request threads only enqueue records; a background thread batches
+        # the writes. Production logs go to stderr for the platform to collect.
+        'async': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'logs' / 'django.log',
+            'class': 'portfolio.log.AsyncLogHandler',
+            'filename': LOG_FILE or None,
+            'formatter': 'json',
+            'queue_size': int(os.environ.get('LOG_QUEUE_SIZE', '10000')),
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['file'],
+            'handlers': ['async'],
+            'level': 'INFO',
+            'propagate': True,
+        },
+        'portfolio': {
+            'handlers': ['async'],
             'level': 'INFO',
             'propagate': True,
         },
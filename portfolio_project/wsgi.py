@@ -3,5 +3,7 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_project.settings')
+# Marks a web server process (see portfolio.apps.is_server_process).
+os.environ['PORTFOLIO_SERVER'] = 'True'
 
 application = get_wsgi_application()
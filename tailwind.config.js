@@ -0,0 +1,24 @@
+/** @type {import('tailwindcss').Config} */
+module.exports = {
+  // Only classes that appear in these files end up in static/dist/site.css.
+  content: [
+    './templates/**/*.html',
+    './portfolio/forms.py',
+    './portfolio/templatetags/*.py',
+  ],
+  darkMode: 'class',
+  theme: {
+    extend: {
+      fontFamily: {
+        sans: ['Inter', 'sans-serif'],
+        mono: ['JetBrains Mono', 'monospace'],
+      },
+      colors: {
+        primary: '#3b82f6',
+        secondary: '#1e40af',
+        accent: '#06b6d4',
+      },
+    },
+  },
+  plugins: [],
+};